@@ -1,24 +1,57 @@
 import numpy as np
 import pickle
+from seeding import default_rng
 
 ACTIONS = ["attack","defend","heal","power"]
+N_FEATURES = 5
+
+
+def policy_actions(features, weights, bias):
+    """Batched policy: features (..., n_features) scored against matching
+    weights (..., n_features, n_actions) and bias (..., n_actions) -> action indices."""
+    scores = np.einsum("...f,...fa->...a", features, weights) + bias
+    return np.argmax(scores, axis=-1)
+
+def breed(weights, bias, n, mix_rate=0.5, rate=0.1, scale=0.2, rng=None, parents=None):
+    """n children of parents weights (P, n_features, n_actions) / bias (P, n_actions),
+    all made at once: two distinct random parents per child (the same one when P is 1),
+    uniform crossover (each parameter from the first parent with probability mix_rate),
+    then mutation (each parameter gets N(0, scale) noise with probability rate).
+    parents: optional (first, second) index arrays of length n instead of random picks.
+    Returns the children's (weights, bias)."""
+    rng = rng or default_rng()
+    # bias rides along as the last row
+    params = np.concatenate([weights, bias[:, None]], axis=1)
+    p = len(params)
+    if parents is not None:
+        first, second = parents
+    else:
+        first = rng.integers(p, size=n)
+        second = (first + rng.integers(1, p, size=n)) % p if p > 1 else first
+    mask = rng.random((n,) + params.shape[1:]) < mix_rate
+    child = np.where(mask, params[first], params[second])
+    mutate = rng.random(child.shape) < rate
+    child += mutate * rng.standard_normal(child.shape) * scale
+    return child[:, :-1], child[:, -1]
+
 
 class Agent:
     """Simple linear policy agent.
     Policy: score = features (vector) @ weights matrix (features x actions) + bias (actions)
     """
-    def __init__(self, weights=None, bias=None):
-        self.n_features = 5
+    def __init__(self, weights=None, bias=None, copy=True, rng=None):
+        self.n_features = N_FEATURES
         self.n_actions = len(ACTIONS)
         if weights is None:
             # small random init
-            self.weights = np.random.randn(self.n_features, self.n_actions) * 0.5
+            rng = rng or default_rng()
+            self.weights = rng.standard_normal((self.n_features, self.n_actions)) * 0.5
         else:
-            self.weights = weights.copy()
+            self.weights = weights.copy() if copy else weights
         if bias is None:
             self.bias = np.zeros(self.n_actions)
         else:
-            self.bias = bias.copy()
+            self.bias = bias.copy() if copy else bias
 
     def act(self, features):
         """features: array-like length n_features -> returns action string"""
@@ -34,21 +67,18 @@ class Agent:
     def from_params(cls, weights, bias):
         return cls(weights=np.array(weights), bias=np.array(bias))
 
-    def mutate(self, rate=0.1, scale=0.2):
-        mask = np.random.rand(*self.weights.shape) < rate
-        self.weights += mask * (np.random.randn(*self.weights.shape) * scale)
-        maskb = np.random.rand(*self.bias.shape) < rate
-        self.bias += maskb * (np.random.randn(*self.bias.shape) * scale)
+    def mutate(self, rate=0.1, scale=0.2, rng=None):
+        # in place, so agents viewing a Population row mutate the row
+        w, b = breed(self.weights[None], self.bias[None], 1, 1.0, rate, scale, rng)
+        self.weights[...] = w[0]
+        self.bias[...] = b[0]
 
     @staticmethod
-    def crossover(a, b, mix_rate=0.5):
-        w1, b1 = a.get_params()
-        w2, b2 = b.get_params()
-        mask = np.random.rand(*w1.shape) < mix_rate
-        w = np.where(mask, w1, w2)
-        mb = np.random.rand(*b1.shape) < mix_rate
-        bias = np.where(mb, b1, b2)
-        return Agent(weights=w, bias=bias)
+    def crossover(a, b, mix_rate=0.5, rng=None):
+        # each parameter from a with probability mix_rate, no mutation
+        w, bias = breed(np.stack([a.weights, b.weights]), np.stack([a.bias, b.bias]), 1, mix_rate, 0.0,
+                        rng=rng, parents=([0], [1]))
+        return Agent(weights=w[0], bias=bias[0], copy=False)
 
     def save(self, path):
         with open(path, "wb") as f:
@@ -59,3 +89,53 @@ class Agent:
         with open(path, "rb") as f:
             w,b = pickle.load(f)
         return Agent.from_params(w,b)
+
+
+class Population:
+    """Stacked parameters for a whole population: weights (P, n_features, n_actions), bias (P, n_actions).
+    Agents handed out by the population are views into these arrays, so in-place
+    mutation on an Agent is visible here and vice versa. They are only created on
+    first access, so array-only code never pays for them."""
+    def __init__(self, weights, bias):
+        self.weights = np.ascontiguousarray(weights, dtype=float)
+        self.bias = np.ascontiguousarray(bias, dtype=float)
+        self._agents = None
+
+    @property
+    def agents(self):
+        if self._agents is None:
+            self._agents = [Agent(self.weights[i], self.bias[i], copy=False) for i in range(len(self.weights))]
+        return self._agents
+
+    @classmethod
+    def random(cls, size, rng=None):
+        rng = rng or default_rng()
+        return cls(rng.standard_normal((size, N_FEATURES, len(ACTIONS))) * 0.5, np.zeros((size, len(ACTIONS))))
+
+    @classmethod
+    def from_agents(cls, agents):
+        """Stack agents into one population and rebind each agent as a view into it."""
+        pop = cls(np.stack([a.weights for a in agents]), np.stack([a.bias for a in agents]))
+        for i, a in enumerate(agents):
+            a.weights = pop.weights[i]
+            a.bias = pop.bias[i]
+        pop._agents = list(agents)
+        return pop
+
+    def __len__(self):
+        return len(self.weights)
+
+    def __getitem__(self, i):
+        return self.agents[i]
+
+    def __iter__(self):
+        return iter(self.agents)
+
+    def act(self, features, idx=None):
+        """Batched act returning action indices.
+        Without idx: features (P, M, n_features) -> (P, M), M fights per agent.
+        With idx: features (K, n_features) scored by agents idx (K,) -> (K,)."""
+        if idx is None:
+            return policy_actions(features, self.weights[:, None], self.bias[:, None])
+        return policy_actions(features, self.weights[idx], self.bias[idx])
+
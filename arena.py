@@ -0,0 +1,191 @@
+from fighter import Fighter, MAX_HP, Ability
+from abilities import power_strike, vampiric_bite, recharge, poison_strike, burn_blast, bleeding_slash, shield_wall
+from pathfield import PathField
+from seeding import BufferedRandom, default_random
+
+# Headless maze fight between two Q-learning fighters: the rules the GUI plays
+# (movement, vision, sneak attacks, the close-range exchange and its Q-updates)
+# with no drawing, so the same code runs in the GUI and in the qtrain workers.
+
+GRID_SIZE = 15
+VISION_RANGE = 7
+
+
+def make_fighters(rng=None, banks=(None, None)):
+    """The two GUI fighters with their abilities. rng seeds both fighters' streams;
+    banks places each fighter in a shared FighterBank."""
+    if rng is not None and not isinstance(rng, BufferedRandom):
+        rng = BufferedRandom(rng)
+    ai1 = Fighter("AI_One", rng=rng, bank=banks[0])
+    ai2 = Fighter("AI_Two", rng=rng, bank=banks[1])
+
+    ai1.add_ability(Ability("Power Strike",3,power_strike))
+    ai1.add_ability(Ability("Vampiric Bite",4,vampiric_bite))
+    ai1.add_ability(Ability("Recharge",5,recharge))
+    ai1.add_ability(Ability("Bleeding Slash",4,bleeding_slash))
+
+    ai2.add_ability(Ability("Poison Strike",3,poison_strike))
+    ai2.add_ability(Ability("Burn Blast",4,burn_blast))
+    ai2.add_ability(Ability("Shield Wall",5,shield_wall))
+    return ai1, ai2
+
+
+class Arena:
+    def __init__(self, ai1, ai2, rng=None, maze_from=None):
+        self.ai1 = ai1
+        self.ai2 = ai2
+        if rng is not None and not isinstance(rng, BufferedRandom):
+            rng = BufferedRandom(rng)
+        self.rng = rng or default_random()
+        # bumped by maze_changed(), so views know when to redraw the tiles
+        self.maze_version = 0
+        if maze_from is not None:
+            # share another arena's maze and its path fields
+            self.maze = maze_from.maze
+            self.paths = maze_from.paths
+        else:
+            self.init_maze()
+
+    # ---------------- Maze ----------------
+    def init_maze(self):
+        # Empty maze
+        self.maze = [[0]*GRID_SIZE for _ in range(GRID_SIZE)]
+
+        # Border walls
+        for i in range(GRID_SIZE):
+            self.maze[0][i] = self.maze[GRID_SIZE-1][i] = 1
+            self.maze[i][0] = self.maze[i][GRID_SIZE-1] = 1
+
+        # Random walls inside the maze
+        wall_count = GRID_SIZE  # roughly GRID_SIZE random walls
+        placed = 0
+        while placed < wall_count:
+            x = self.rng.randint(1, GRID_SIZE-2)
+            y = self.rng.randint(1, GRID_SIZE-2)
+            # Don't block the surrounding area too much
+            if self.maze[y][x] == 0 and self.surrounding_free(x, y):
+                self.maze[y][x] = 1
+                placed += 1
+        # shortest-path fields for movement, rebuilt whenever the maze changes
+        self.paths = PathField(self.maze)
+
+    def set_wall(self, x, y, wall=True):
+        self.maze[y][x] = 1 if wall else 0
+        self.maze_changed()
+
+    def maze_changed(self):
+        """Invalidation hook: call after editing self.maze directly."""
+        self.paths.invalidate()
+        self.maze_version += 1
+
+    def surrounding_free(self, x, y):
+        """Ensure at least one open path in all directions to prevent trapping."""
+        for dx, dy in [(-1,0),(1,0),(0,-1),(0,1)]:
+            nx, ny = x+dx, y+dy
+            if 0 <= nx < GRID_SIZE and 0 <= ny < GRID_SIZE:
+                if self.maze[ny][nx] == 0:
+                    return True
+        return False
+
+    # ---------------- Fight setup ----------------
+    def start_new_fight(self):
+        for f in [self.ai1,self.ai2]:
+            f.hp = MAX_HP
+            f.statuses.clear()
+            for a in f.abilities: a.cur_cd = 0
+
+        while True:
+            x1,y1 = self.rng.randint(1,GRID_SIZE-2), self.rng.randint(1,GRID_SIZE-2)
+            x2,y2 = self.rng.randint(1,GRID_SIZE-2), self.rng.randint(1,GRID_SIZE-2)
+            if self.maze[y1][x1]==0 and self.maze[y2][x2]==0 and abs(x1-x2)+abs(y1-y2)>6:
+                self.ai1.pos = (x1,y1)
+                self.ai2.pos = (x2,y2)
+                break
+
+    def winner(self):
+        """The fighter left standing, or None while both are alive."""
+        if self.ai1.hp<=0 or self.ai2.hp<=0:
+            return self.ai1 if self.ai1.hp>0 else self.ai2
+        return None
+
+    # ---------------- Fight update ----------------
+    def step(self, batch=None, tick=True):
+        """One update: tick statuses and cooldowns, move, and trade blows when in reach.
+        Returns (logs, actions); actions lists the (attacker, action) pairs of the
+        exchange, empty when the fighters didn't meet. With a TransitionBatch the
+        Q-updates are queued on it instead of applied; tick=False skips the ticks
+        for callers that tick a whole FighterBank at once."""
+        logs = []
+        if tick:
+            for f in [self.ai1,self.ai2]:
+                logs.extend(f.tick_statuses())
+                f.tick_cooldowns()
+
+        ax,ay = self.ai1.pos
+        bx,by = self.ai2.pos
+        dist = abs(ax-bx)+abs(ay-by)
+
+        visible1 = self.can_see(self.ai1,self.ai2)
+        visible2 = self.can_see(self.ai2,self.ai1)
+
+        # Sneak attack: crit first hit if only one sees the other
+        sneak_attacker = None
+        if visible1 != visible2:
+            sneak_attacker = self.ai1 if not visible1 else self.ai2
+            logs.append(f"💥 {sneak_attacker.name} performs a sneak attack!")
+
+        # Movement
+        if dist>1 or not visible1: self.ai_move(self.ai1,self.ai2, visible1)
+        if dist>1 or not visible2: self.ai_move(self.ai2,self.ai1, visible2)
+
+        actions = []
+        if dist <= 1 and (visible1 or visible2):
+            actions = self.exchange(sneak_attacker, logs, batch)
+        return logs, actions
+
+    def exchange(self, sneak_attacker=None, logs=None, batch=None):
+        # Determine action order for sneak attack
+        if sneak_attacker==self.ai2:
+            order = [(self.ai2,self.ai1),(self.ai1,self.ai2)]
+        else:
+            order = [(self.ai1,self.ai2),(self.ai2,self.ai1)]
+
+        actions = []
+        for attacker, defender in order:
+            a = attacker.choose_action(defender)
+            log,r = attacker.perform_action(a, defender)
+            if logs is not None: logs.append(log)
+            actions.append((attacker, a))
+            ns = attacker.state_key(defender)
+            if batch is not None:
+                batch.add(attacker, ns, a, r, ns)
+            else:
+                attacker.update_q(ns, a, r, ns)
+        return actions
+
+    # ---------------- Visibility ----------------
+    def can_see(self, ai, opp):
+        ax,ay = ai.pos
+        bx,by = opp.pos
+        return abs(ax-bx)+abs(ay-by) <= VISION_RANGE
+
+    # ---------------- AI movement with pathfinding ----------------
+    def ai_move(self, ai, opp, sees_opponent):
+        if ai.statuses.get("stunned",0)>0: return
+        steps_per_turn = 2
+        for _ in range(steps_per_turn):
+            step = self.paths.next_step(ai.pos, opp.pos) if sees_opponent else None
+            if step is not None:
+                ai.pos = step  # move next step along path
+            else:
+                # fallback random move
+                ax,ay = ai.pos
+                move_options = [(ax+dx, ay+dy) for dx,dy in [(0,-1),(0,1),(-1,0),(1,0)]
+                                if 0<=ax+dx<GRID_SIZE and 0<=ay+dy<GRID_SIZE and self.maze[ay+dy][ax+dx]==0]
+                if move_options:
+                    ai.pos = self.rng.choice(move_options)
+
+    def find_path(self, start, goal):
+        # shortest path from the precomputed fields if goal exists
+        if goal is None: return None
+        return self.paths.path(start, goal)
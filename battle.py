@@ -1,13 +1,30 @@
-import random
 import numpy as np
-from agents import ACTIONS
+from agents import ACTIONS, N_FEATURES, policy_actions
+from seeding import BufferedRandom, default_random, default_rng
+from profiling import PROFILER
 
 MAX_HP = 100
 
+# Log modes for simulate_fight: no log, structured event array, or rendered text
+LOG_NONE, LOG_EVENTS, LOG_TEXT = "none", "events", "text"
+
+# Event rows are (turn, actor, code, amount); actor 0 = A, 1 = B.
+# Codes 0-3 match ACTIONS indices, the rest are the fallback variants.
+EV_ATTACK, EV_DEFEND, EV_HEAL, EV_POWER, EV_POWER_CD, EV_FALLBACK = range(6)
+EVENT_TEXT = (
+    "{name} attacks for {amount}.",
+    "{name} defends (shield 1 turn).",
+    "{name} heals {amount}.",
+    "{name} uses Power for {amount}.",
+    "{name} tried Power (on cooldown) and fallback attacks for {amount}.",
+    "{name} fallback hits for {amount}.",
+)
+
 class Combatant:
-    def __init__(self, agent, name="Agent"):
+    def __init__(self, agent, name="Agent", rng=None):
         self.agent = agent
         self.name = name
+        self.rng = rng or default_random()
         self.hp = MAX_HP
         self.shield_turns = 0
         self.power_cd = 0
@@ -19,46 +36,51 @@ class Combatant:
             opp.hp / MAX_HP,
             1.0 if self.shield_turns>0 else 0.0,
             1.0 if opp.shield_turns>0 else 0.0,
-            random.random()
+            self.rng.random()
         ], dtype=float)
 
     def apply_action(self, action, opp):
-        log = ""
+        """Apply action and return its event as (code, amount); see render_events."""
+        amount = 0
         if action=="attack":
-            dmg = random.randint(8,14)
+            code = EV_ATTACK
+            dmg = self.rng.randint(8,14)
             if opp.shield_turns>0:
                 dmg = dmg//2
             opp.hp -= dmg
-            log = f"{self.name} attacks for {dmg}."
+            amount = dmg
         elif action=="defend":
+            code = EV_DEFEND
             self.shield_turns = 1
-            log = f"{self.name} defends (shield 1 turn)."
         elif action=="heal":
-            heal = random.randint(4,8)
+            code = EV_HEAL
+            heal = self.rng.randint(4,8)
             self.hp = min(MAX_HP, self.hp + heal)
-            log = f"{self.name} heals {heal}."
+            amount = heal
         elif action=="power":
             if self.power_cd>0:
                 # fallback to attack
-                dmg = random.randint(6,10)
+                code = EV_POWER_CD
+                dmg = self.rng.randint(6,10)
                 if opp.shield_turns>0:
                     dmg = dmg//2
                 opp.hp -= dmg
-                log = f"{self.name} tried Power (on cooldown) and fallback attacks for {dmg}."
             else:
-                dmg = random.randint(18,28)
+                code = EV_POWER
+                dmg = self.rng.randint(18,28)
                 if opp.shield_turns>0:
                     dmg = dmg//2
                 opp.hp -= dmg
                 self.power_cd = 3
-                log = f"{self.name} uses Power for {dmg}."
+            amount = dmg
         else:
             # unknown => minor attack
-            dmg = random.randint(5,9)
+            code = EV_FALLBACK
+            dmg = self.rng.randint(5,9)
             if opp.shield_turns>0:
                 dmg = dmg//2
             opp.hp -= dmg
-            log = f"{self.name} fallback hits for {dmg}."
+            amount = dmg
 
         # update statuses
         if self.shield_turns>0:
@@ -68,28 +90,52 @@ class Combatant:
         # clamp
         self.hp = max(0, min(self.hp, MAX_HP))
         opp.hp = max(0, min(opp.hp, MAX_HP))
-        return log
+        return code, amount
+
+
+def render_events(events, names=("A", "B")):
+    """Render an event array from simulate_fight(log_mode=LOG_EVENTS) as text lines."""
+    return [EVENT_TEXT[code].format(name=names[actor], amount=amount)
+            for _, actor, code, amount in events.tolist()]
 
 
-def simulate_fight(agent_a, agent_b, max_turns=200):
-    a = Combatant(agent_a, name="A")
-    b = Combatant(agent_b, name="B")
+def simulate_fight(agent_a, agent_b, max_turns=200, rng=None, log_mode=LOG_TEXT):
+    """rng: BufferedRandom (or seed/Generator) for this fight's stream.
+    log_mode: LOG_NONE returns logs=None, LOG_EVENTS an int array of
+    (turn, actor, code, amount) rows, LOG_TEXT a list of strings."""
+    if rng is not None and not isinstance(rng, BufferedRandom):
+        rng = BufferedRandom(rng)
+    a = Combatant(agent_a, name="A", rng=rng)
+    b = Combatant(agent_b, name="B", rng=rng)
 
-    logs = []
+    # preallocated event buffer; at most two events per turn
+    events = None if log_mode == LOG_NONE else np.empty((2*max_turns, 4), dtype=np.int32)
+    n_events = 0
     turn = 0
     while a.hp>0 and b.hp>0 and turn < max_turns:
         turn += 1
         # A acts
         fa = a.features_against(b)
         act_a = agent_a.act(fa)
-        logs.append(a.apply_action(act_a, b))
+        code, amount = a.apply_action(act_a, b)
+        if events is not None:
+            events[n_events] = (turn, 0, code, amount)
+            n_events += 1
         if b.hp<=0:
             break
         # B acts
         fb = b.features_against(a)
         act_b = agent_b.act(fb)
-        logs.append(b.apply_action(act_b, a))
+        code, amount = b.apply_action(act_b, a)
+        if events is not None:
+            events[n_events] = (turn, 1, code, amount)
+            n_events += 1
         # next
+    if PROFILER.enabled:
+        # B skips its move in the turn A knocks it out
+        PROFILER.count("fights")
+        PROFILER.count("turns", turn)
+        PROFILER.count("decisions", 2*turn - (b.hp <= 0))
     winner = None
     if a.hp>0 and b.hp<=0:
         winner = "A"
@@ -103,4 +149,95 @@ def simulate_fight(agent_a, agent_b, max_turns=200):
             winner = "B"
         else:
             winner = "draw"
+    if events is None:
+        return winner, a.hp, b.hp, None
+    events = events[:n_events]
+    logs = render_events(events, (a.name, b.name)) if log_mode == LOG_TEXT else events
     return winner, a.hp, b.hp, logs
+
+
+# Outcome codes returned by the batched engine
+A_WINS, B_WINS, DRAW = 0, 1, 2
+WINNER_NAMES = ("A", "B", "draw")
+
+# (low, high) damage/heal roll per action index; power on cooldown uses POWER_FALLBACK
+ROLL_RANGES = np.array([[8,14],[0,0],[4,8],[18,28]])
+POWER_FALLBACK = (6,10)
+ATTACK, DEFEND, HEAL, POWER = EV_ATTACK, EV_DEFEND, EV_HEAL, EV_POWER
+RNG_CHUNK = 16      # turns of random numbers simulate_fights draws per stream at a time
+
+
+def simulate_fights(weights_a, bias_a, weights_b, bias_b, max_turns=200, rng=None, decisions=None, block=None):
+    """Play N fights at once with the same rules as simulate_fight.
+    weights_*: (N, n_features, n_actions), bias_*: (N, n_actions).
+    rng: numpy Generator, or a list of Generators where fight i draws from rng[i // block].
+    Each stream is only drawn from for its own block's running fights, so a fight's
+    outcome depends only on its block, not on which other blocks share the call.
+    decisions: optional int array (N,), incremented by each policy decision per fight.
+    Returns (winner, a_hp, b_hp) arrays of length N; winner holds A_WINS/B_WINS/DRAW."""
+    rng = rng if rng is not None else default_rng()
+    n = len(weights_a)
+    if isinstance(rng, np.random.Generator):
+        rng, block = [rng], max(n, 1)
+    weights = (np.asarray(weights_a, dtype=float), np.asarray(weights_b, dtype=float))
+    bias = (np.asarray(bias_a, dtype=float), np.asarray(bias_b, dtype=float))
+    hp = np.full((2, n), MAX_HP, dtype=np.int64)
+    shield = np.zeros((2, n), dtype=np.int64)
+    cd = np.zeros((2, n), dtype=np.int64)
+    running = np.ones(n, dtype=bool)
+
+    for turn in range(max_turns):
+        if turn % RNG_CHUNK == 0:
+            # (turn, mover, noise/roll, slot) uniforms for the next RNG_CHUNK turns, one
+            # slot per running fight, taken from its block's stream in fight order
+            active = np.flatnonzero(running)
+            counts = np.bincount(active // block, minlength=len(rng))
+            u = np.concatenate([g.random((RNG_CHUNK, 2, 2, c)) for g, c in zip(rng, counts.tolist()) if c]
+                               or [np.empty((RNG_CHUNK, 2, 2, 0))], axis=-1)
+            slot = np.empty(n, dtype=np.int64)
+            slot[active] = np.arange(active.size)
+        for me in (0, 1):
+            idx = np.flatnonzero(running)
+            if idx.size == 0:
+                break
+            opp = 1 - me
+            feats = np.empty((idx.size, N_FEATURES))
+            feats[:,0] = hp[me, idx] / MAX_HP
+            feats[:,1] = hp[opp, idx] / MAX_HP
+            feats[:,2] = shield[me, idx] > 0
+            feats[:,3] = shield[opp, idx] > 0
+            draws = u[turn % RNG_CHUNK, me][:, slot[idx]]
+            feats[:,4] = draws[0]
+            act = policy_actions(feats, weights[me][idx], bias[me][idx])
+            if decisions is not None:
+                decisions[idx] += 1
+
+            # one bulk roll for every running fight
+            lo = ROLL_RANGES[act, 0]
+            hi = ROLL_RANGES[act, 1]
+            on_cd = (act == POWER) & (cd[me, idx] > 0)
+            lo = np.where(on_cd, POWER_FALLBACK[0], lo)
+            hi = np.where(on_cd, POWER_FALLBACK[1], hi)
+            roll = lo + (draws[1] * (hi - lo + 1)).astype(np.int64)
+
+            hits = (act == ATTACK) | (act == POWER)
+            dmg = np.where(shield[opp, idx] > 0, roll // 2, roll)
+            hp[opp, idx] -= np.where(hits, dmg, 0)
+            heals = act == HEAL
+            hp[me, idx] = np.where(heals, np.minimum(MAX_HP, hp[me, idx] + roll), hp[me, idx])
+            shield[me, idx] = np.where(act == DEFEND, 1, shield[me, idx])
+            cd[me, idx] = np.where((act == POWER) & ~on_cd, 3, cd[me, idx])
+
+            # update statuses
+            shield[me, idx] = np.maximum(0, shield[me, idx] - 1)
+            cd[me, idx] = np.maximum(0, cd[me, idx] - 1)
+            # clamp
+            hp[:, idx] = np.clip(hp[:, idx], 0, MAX_HP)
+            # finished fights drop out of the batch
+            running[idx] = hp[opp, idx] > 0
+        if not running.any():
+            break
+
+    a_hp, b_hp = hp
+    winner = np.where(a_hp > b_hp, A_WINS, np.where(b_hp > a_hp, B_WINS, DRAW))
+    return winner, a_hp, b_hp
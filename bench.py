@@ -0,0 +1,223 @@
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+import numpy as np
+from agents import Agent, Population, N_FEATURES
+from arena import Arena, make_fighters
+from battle import simulate_fight, simulate_fights, LOG_NONE
+from ga_train import evolve
+from qtable import ArrayQTable, append_log, write_snapshot
+from seeding import stream, BufferedRandom
+import qtrain
+
+# Headless benchmarks of the hot paths, all seeded so two runs do the same work.
+# Each benchmark builds its inputs once, then its run() is called `warmup` times
+# untimed and `repeats` times timed; the fastest repeat is reported. Results go
+# to a JSON file and are compared against a stored baseline to flag regressions.
+
+BENCH_FILE = "bench_results.json"
+BASELINE_FILE = "bench_baseline.json"
+BENCH_SEED = 1234
+
+
+class BenchSettings:
+    warmup = 1
+    repeats = 5
+    scale = 1.0         # multiplies every benchmark's amount of work (--quick uses 0.1)
+    tolerance = 0.15    # a result more than this fraction worse than the baseline is a regression
+
+
+def _n(count):
+    return max(1, int(count * BenchSettings.scale))
+
+
+# Each benchmark returns (run, unit, higher_is_better): run() does a fixed amount
+# of work and returns how many units it did (None for a plain duration in ms).
+
+def bench_simulate_fight():
+    rng = stream(BENCH_SEED, 0)
+    a, b = Agent(rng=rng), Agent(rng=rng)
+    fights = _n(200)
+    def run():
+        fight_rng = BufferedRandom(stream(BENCH_SEED, 1))
+        for _ in range(fights):
+            simulate_fight(a, b, rng=fight_rng, log_mode=LOG_NONE)
+        return fights
+    return run, "fights/s", True
+
+
+def bench_simulate_fights():
+    pop = Population.random(64, rng=stream(BENCH_SEED, 0))
+    rng = stream(BENCH_SEED, 1)
+    fights = _n(20000)
+    idx_a, idx_b = rng.integers(0, 64, fights), rng.integers(0, 64, fights)
+    args = (pop.weights[idx_a], pop.bias[idx_a], pop.weights[idx_b], pop.bias[idx_b])
+    def run():
+        simulate_fights(*args, rng=stream(BENCH_SEED, 2))
+        return fights
+    return run, "fights/s", True
+
+
+def bench_agent_act():
+    rng = stream(BENCH_SEED, 0)
+    agent = Agent(rng=rng)
+    features = rng.random((_n(20000), N_FEATURES)).tolist()
+    def run():
+        act = agent.act
+        for f in features:
+            act(f)
+        return len(features)
+    return run, "decisions/s", True
+
+
+def bench_evolve():
+    pop = [Agent(rng=stream(BENCH_SEED, 0)) for _ in range(60)]
+    generations = _n(5)
+    def run():
+        p = pop
+        for gen in range(1, generations+1):
+            p, _ = evolve(p, generation=gen, seed=BENCH_SEED)
+        return generations
+    return run, "generations/s", True
+
+
+def bench_q_step():
+    ai1, ai2 = make_fighters(stream(BENCH_SEED, 0))
+    for f in (ai1, ai2):
+        f.q_table = ArrayQTable(f.all_actions())
+    steps = _n(20000)
+    def run():
+        for i in range(steps):
+            attacker, defender = (ai1, ai2) if i % 2 == 0 else (ai2, ai1)
+            a = attacker.choose_action(defender)
+            _, r = attacker.perform_action(a, defender)
+            ns = attacker.state_key(defender)
+            attacker.update_q(ns, a, r, ns)
+            if defender.hp <= 0:
+                defender.hp = defender.max_hp
+                defender.statuses.clear()
+        return steps
+    return run, "q-steps/s", True
+
+
+def bench_find_path():
+    ai1, ai2 = make_fighters(stream(BENCH_SEED, 0))
+    arena = Arena(ai1, ai2, rng=stream(BENCH_SEED, 1))
+    cells = [(x, y) for y, row in enumerate(arena.maze) for x, c in enumerate(row) if c == 0]
+    rng = stream(BENCH_SEED, 2)
+    pairs = [(cells[i], cells[j]) for i, j in rng.integers(0, len(cells), (_n(20000), 2)).tolist()]
+    def run():
+        for start, goal in pairs:
+            arena.find_path(start, goal)
+        return len(pairs)
+    return run, "queries/s", True
+
+
+def bench_exact_solve():
+    from exact import policy_probs, solve
+    pop = Population.random(2*_n(4), rng=stream(BENCH_SEED, 0))
+    probs = [policy_probs(w, b) for w, b in zip(pop.weights, pop.bias)]
+    def run():
+        for i in range(0, len(probs), 2):
+            solve(probs[i], probs[i+1])
+        return len(probs) // 2
+    return run, "solves/s", True
+
+
+def bench_load_qtables():
+    # a table the size of QTABLE_MAX_STATES, snapshot plus a delta log, loaded the way the GUI starts
+    ai1, ai2 = make_fighters(stream(BENCH_SEED, 0))
+    tmp = tempfile.mkdtemp()
+    rng = stream(BENCH_SEED, 1)
+    for f in (ai1, ai2):
+        prefix = os.path.join(tmp, qtrain.table_prefix(f.name))
+        n = len(f.all_actions())
+        codes = np.unique(rng.integers(0, 1 << 40, qtrain.QTABLE_MAX_STATES))
+        m = len(codes)
+        write_snapshot(prefix, f.all_actions(), codes, rng.random((m, n)), np.ones((m, n), dtype=bool),
+                       np.ones(m, dtype=np.int64))
+        k = 2000
+        append_log(prefix + ".log", (codes[:k], rng.random((k, n)), np.ones((k, n), dtype=bool), np.ones(k, dtype=np.int64)))
+    def run():
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            qtrain.load_tables([ai1, ai2])
+        finally:
+            os.chdir(cwd)
+    run.cleanup = lambda: shutil.rmtree(tmp, ignore_errors=True)
+    return run, "ms", False
+
+
+BENCHMARKS = {
+    "simulate_fight": bench_simulate_fight,
+    "simulate_fights": bench_simulate_fights,
+    "agent_act": bench_agent_act,
+    "evolve": bench_evolve,
+    "q_step": bench_q_step,
+    "find_path": bench_find_path,
+    "exact_solve": bench_exact_solve,
+    "load_qtables": bench_load_qtables,
+}
+
+
+def measure(setup):
+    run, unit, higher_is_better = setup()
+    try:
+        for _ in range(BenchSettings.warmup):
+            run()
+        best, ops = None, None
+        for _ in range(BenchSettings.repeats):
+            started = time.perf_counter()
+            ops = run()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+    finally:
+        if hasattr(run, "cleanup"):
+            run.cleanup()
+    value = best*1000 if ops is None else ops/best
+    return {"value": value, "unit": unit, "higher_is_better": higher_is_better, "seconds": best}
+
+
+def run_benchmarks(names=None, status_cb=print):
+    names = names or list(BENCHMARKS)
+    results = {}
+    for name in names:
+        results[name] = r = measure(BENCHMARKS[name])
+        status_cb(f"{name:16s} {r['value']:14,.1f} {r['unit']}")
+    return {"meta": {"python": platform.python_version(), "numpy": np.__version__,
+                     "machine": platform.machine(), "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                     "scale": BenchSettings.scale, "repeats": BenchSettings.repeats},
+            "results": results}
+
+
+def compare(report, baseline, tolerance=None):
+    """(lines, regressions): one line per benchmark in both reports, and the names
+    that got worse than the baseline by more than tolerance."""
+    tolerance = BenchSettings.tolerance if tolerance is None else tolerance
+    lines, regressions = [], []
+    for name, r in report["results"].items():
+        base = baseline["results"].get(name)
+        if base is None or base["unit"] != r["unit"]:
+            continue
+        # >1 means faster than the baseline whichever way the unit points
+        speedup = r["value"]/base["value"] if r["higher_is_better"] else base["value"]/r["value"]
+        flag = ""
+        if speedup < 1 - tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        lines.append(f"{name:16s} {base['value']:14,.1f} -> {r['value']:14,.1f} {r['unit']:14s} x{speedup:.2f}{flag}")
+    return lines, regressions
+
+
+def save_report(report, path):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+def load_report(path):
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,94 @@
+import os
+import threading
+import numpy as np
+
+CHECKPOINT_PATH = "ga_checkpoint.npz"
+
+
+def fsync_dir(path):
+    """fsync the directory holding path, so files created or renamed in it survive a
+    crash. A no-op where directories can't be opened (Windows)."""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def save_checkpoint(path, weights, bias, generation, seed, history, best_weights, best_bias, islands=1):
+    """Write the full GA state to one .npz file; island runs store their islands
+    stacked in weights/bias, `islands` equal blocks of rows. The file is written and
+    fsynced next to path, then swapped in with os.replace, so a crash never leaves a
+    half-written checkpoint."""
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, weights=weights, bias=bias, generation=np.int64(generation),
+                 seed=np.str_(str(seed)), history=np.asarray(history, dtype=float).reshape(-1, 2),
+                 best_weights=best_weights, best_bias=best_bias, islands=np.int64(islands),
+                 pop_size=np.int64(len(weights) // islands))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    fsync_dir(path)
+
+
+def load_checkpoint(path=CHECKPOINT_PATH):
+    """Returns a dict with the arrays saved by save_checkpoint (seed back as an int,
+    islands and pop_size as ints; pop_size is per island)."""
+    with np.load(path, allow_pickle=False) as data:
+        state = {k: data[k] for k in data.files}
+    state["generation"] = int(state["generation"])
+    state["seed"] = int(str(state["seed"]))
+    # checkpoints from before islands were recorded hold one population
+    state["islands"] = int(state.get("islands", 1))
+    state["pop_size"] = int(state.get("pop_size", len(state["weights"]) // state["islands"]))
+    return state
+
+
+def check_layout(state, islands, pop_size):
+    """Raise ValueError unless a loaded checkpoint has this many islands of pop_size
+    agents, so a resume never silently reshapes the population."""
+    if state["islands"] != islands or state["pop_size"] != pop_size:
+        raise ValueError(f"checkpoint holds {state['islands']} island(s) of {state['pop_size']} agents, "
+                         f"but this run has {islands} of {pop_size}; resume with matching "
+                         f"--islands / population settings")
+    return state
+
+
+class CheckpointWriter:
+    """Background writer: submit() just hands the latest state to a worker thread.
+    If a write is still running, only the newest pending state is kept."""
+    def __init__(self, path=CHECKPOINT_PATH):
+        self.path = path
+        self._pending = None
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, **state):
+        with self._cond:
+            self._pending = state
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closed:
+                    self._cond.wait()
+                if self._pending is None:
+                    return
+                state, self._pending = self._pending, None
+            save_checkpoint(self.path, **state)
+
+    def close(self):
+        """Flush the last pending state and stop the thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
@@ -0,0 +1,172 @@
+import numpy as np
+from collections import namedtuple
+from battle import MAX_HP, ROLL_RANGES, POWER_FALLBACK, ATTACK, DEFEND, HEAL, POWER
+
+# Exact expected outcome of a fight between two linear-policy agents. Under the
+# battle rules a shield never outlives the action that raised it, so at every
+# decision the state is just (hp, hp, power cooldown, power cooldown), with the
+# cooldown 0-2, and the only randomness is the noise feature and the uniform rolls.
+# The probability mass over those states is pushed forward half-turn by half-turn
+# (absorbing knockouts as it goes) for up to max_turns turns, the same cap as
+# simulate_fight, so the outcome probabilities are exact rather than sampled.
+
+H = MAX_HP + 1          # hp 0..MAX_HP; index 0 is never alive
+COOLDOWNS = 3           # power cooldown seen at a decision: 0, 1 or 2
+POWER_COOLDOWN = 2      # set to 3 by Power, then ticked once before the next decision
+ALIVE_TOL = 1e-12       # stop once less than this much probability is still fighting
+
+
+def policy_probs(weights, bias):
+    """(H, H, n_actions) probability that the agent picks each action with own hp i
+    and opponent hp j. Shield features are always 0 at a decision; the noise feature
+    u ~ U[0, 1) enters every score linearly, so each action wins on an interval of u
+    (ties go to the lower action index, like argmax)."""
+    hp = np.arange(H) / MAX_HP
+    # score_a(u) = c[i, j, a] + g[a] * u
+    c = hp[:, None, None]*weights[0] + hp[None, :, None]*weights[1] + bias
+    g = weights[4]
+    n = len(bias)
+    probs = np.empty((H, H, n))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for a in range(n):
+            lo = np.zeros((H, H))
+            hi = np.ones((H, H))
+            for b in range(n):
+                if b == a:
+                    continue
+                dc = c[..., a] - c[..., b]
+                dg = g[a] - g[b]
+                if dg > 0:
+                    lo = np.maximum(lo, -dc/dg)
+                elif dg < 0:
+                    hi = np.minimum(hi, -dc/dg)
+                else:
+                    hi = np.where((dc > 0) | ((dc == 0) & (a < b)), hi, 0.0)
+            probs[..., a] = np.maximum(0.0, hi - lo)
+    return probs
+
+
+class _Roll:
+    """Uniform integer roll lo..hi (inclusive, like randint). The mass it moves along
+    an hp axis is a window sum, taken as the difference of two slices of a padded
+    cumulative sum. Inputs are pre-divided by k (see _Side), so windows are sums."""
+    def __init__(self, lo, hi):
+        self.lo, self.hi = int(lo), int(hi)
+        self.k = self.hi - self.lo + 1
+        h = np.arange(H)
+        d = np.arange(self.lo, self.hi + 1)
+        # rolls that knock out a fighter on hp h / take a heal from h to MAX_HP
+        self.dead = (d[None, :] >= h[:, None]).sum(axis=1).astype(float)
+        self.cap = (h[:, None] + d[None, :] >= MAX_HP).sum(axis=1).astype(float)
+
+    def damage(self, x, cum, out, add=True):
+        """Move x over (..., opp hp) down by the roll into out (added or assigned);
+        cum is scratch of shape (..., H+1+PAD). Returns the knocked-out mass, shaped
+        like x without its last axis. out[..., 0] is left for the caller to clear."""
+        n = len(x)
+        cum = cum[:n]
+        # cum[i] = x[..., :i].sum(), padded past MAX_HP with the total
+        np.cumsum(x, axis=-1, out=cum[..., 1:H+1])
+        cum[..., H+1:] = cum[..., H:H+1]
+        # new hp h comes from h+lo..h+hi
+        if add:
+            out += cum[..., self.hi+1:self.hi+1+H]
+            out -= cum[..., self.lo:self.lo+H]
+        else:
+            np.subtract(cum[..., self.hi+1:self.hi+1+H], cum[..., self.lo:self.lo+H], out=out)
+        return x @ self.dead
+
+    def heal(self, x, cum, out):
+        """Add x over (..., own hp, opp hp) moved up by the roll along own hp, capped
+        at MAX_HP, into out; cum is scratch of shape (..., H+1+PAD, H)."""
+        # cum[hi + i] = x[..., :i, :].sum(), zero for i <= 0
+        cum[..., :self.hi+1, :] = 0.0
+        np.cumsum(x, axis=-2, out=cum[..., self.hi+1:self.hi+1+H, :])
+        # new hp h comes from h-hi..h-lo; everything from MAX_HP-hi up can reach the cap
+        w = self.k
+        out[..., :MAX_HP, :] += cum[..., w:w+MAX_HP, :]
+        out[..., :MAX_HP, :] -= cum[..., :MAX_HP, :]
+        out[..., MAX_HP, :] += self.cap @ x
+
+
+_ATTACK = _Roll(*ROLL_RANGES[ATTACK])
+_HEAL = _Roll(*ROLL_RANGES[HEAL])
+_POWER = _Roll(*ROLL_RANGES[POWER])
+_FALLBACK = _Roll(*POWER_FALLBACK)
+PAD = max(r.hi for r in (_ATTACK, _HEAL, _POWER, _FALLBACK))
+
+Outcome = namedtuple("Outcome", "a_wins b_wins draw a_hp b_hp a_score b_score")
+
+
+class _Side:
+    """One fighter's policy tables, indexed (own hp, opp hp), each pre-divided by the
+    k of the roll that follows, plus the scratch buffers for its half-turns."""
+    def __init__(self, probs):
+        self.attack = probs[..., ATTACK] / _ATTACK.k
+        self.defend = np.ascontiguousarray(probs[..., DEFEND])
+        self.heal = probs[..., HEAL] / _HEAL.k
+        self.power = probs[..., POWER] / _POWER.k
+        self.fallback = probs[..., POWER] / _FALLBACK.k
+        shape = (COOLDOWNS, COOLDOWNS, H, H)
+        self.x = np.empty(shape)
+        self.moved = np.empty(shape)
+        self.cum = np.empty((COOLDOWNS, COOLDOWNS, H, H + 1 + PAD))
+        self.heal_cum = np.empty((COOLDOWNS, COOLDOWNS, H + 1 + PAD, H))
+
+    def half_turn(self, dist, new):
+        """The mover acts on dist (cd_me, cd_opp, hp_me, hp_opp), writing the result
+        to new (same layout; either may be a transposed view). Returns the
+        knocked-out mass by the mover's hp."""
+        x, moved = self.x, self.moved
+        # defend only ticks the cooldown
+        np.multiply(dist, self.defend, out=moved)
+        np.multiply(dist, self.attack, out=x)
+        ko = _ATTACK.damage(x, self.cum, moved).sum(axis=(0, 1))
+        np.multiply(dist, self.heal, out=x)
+        _HEAL.heal(x, self.heal_cum, moved)
+        # Power on cooldown falls back to a weaker hit; off cooldown it starts the cooldown
+        np.multiply(dist[1:], self.fallback, out=x[1:])
+        ko += _FALLBACK.damage(x[1:], self.cum, moved[1:]).sum(axis=(0, 1))
+        np.multiply(dist[0], self.power, out=x[0])
+        ko += _POWER.damage(x[0], self.cum[0], new[POWER_COOLDOWN], add=False).sum(axis=0)
+        # every other action ticks the cooldown
+        np.add(moved[0], moved[1], out=new[0])
+        new[1] = moved[2]
+        new[..., 0] = 0.0
+        return ko
+
+
+def solve(probs_a, probs_b, max_turns=200, tol=ALIVE_TOL):
+    """Exact Outcome of A (moving first) against B, each given by policy_probs():
+    win/draw probabilities, expected remaining hp, and each side's expected
+    ga_train.fight_scores score (win 1 + hp/100, loss hp/100, draw 0.5).
+    tol stops early once the mass still fighting is below it (the rest is then
+    scored as if the turn cap had been reached); tol=0 always plays to max_turns."""
+    a, b = _Side(probs_a), _Side(probs_b)
+    hp = np.arange(H)
+    # (cd_a, cd_b, hp_a, hp_b); B moves on the transposed view, which is its own perspective
+    dist = np.zeros((COOLDOWNS, COOLDOWNS, H, H))
+    dist[0, 0, MAX_HP, MAX_HP] = 1.0
+    other = np.empty_like(dist)
+    a_wins = b_wins = a_hp = b_hp = 0.0
+    for _ in range(max_turns):
+        ko = a.half_turn(dist, other)
+        a_wins += ko.sum()
+        a_hp += ko @ hp
+        ko = b.half_turn(other.transpose(1, 0, 3, 2), dist.transpose(1, 0, 3, 2))
+        b_wins += ko.sum()
+        b_hp += ko @ hp
+        if dist.sum() < tol:
+            break
+    # fights still going at the cap are decided on hp
+    left = dist.sum(axis=(0, 1))
+    ahead = left[hp[:, None] > hp[None, :]].sum()
+    behind = left[hp[:, None] < hp[None, :]].sum()
+    draw = left.sum() - ahead - behind
+    left_a = left.sum(axis=1) @ hp
+    left_b = left.sum(axis=0) @ hp
+    draw_hp = np.diag(left) @ hp
+    # a knocked-out side ends on 0 hp and scores nothing
+    a_score = a_wins + ahead + (a_hp + left_a - draw_hp)/MAX_HP + 0.5*draw
+    b_score = b_wins + behind + (b_hp + left_b - draw_hp)/MAX_HP + 0.5*draw
+    return Outcome(a_wins + ahead, b_wins + behind, draw, a_hp + left_a, b_hp + left_b, a_score, b_score)
@@ -1,8 +1,35 @@
-import random
-from collections import defaultdict, deque
+from array import array
+import numpy as np
+from seeding import BufferedRandom, default_random
+from qtable import ArrayQTable, MOODS, MAX_ABILITIES, COMBO_LEN
 
 MAX_HP = 100
 HP_BUCKET = 10
+# statuses that are part of the Q-learning state, in state-key order
+STATE_STATUSES = ("burn","poison","bleed","shield","shield_wall","charged","stunned")
+# fixed status slots; the first TICKED_STATUSES count down every tick and the
+# first len(DOT_DAMAGE) of those also deal damage over time
+STATUS_NAMES = ("burn","poison","bleed","heal_cd","defend_cd","shield","shield_wall","charged","stunned")
+DOT_DAMAGE = (5, 4, 6)
+TICKED_STATUSES = 5
+_STATUS_INDEX = {s: i for i, s in enumerate(STATUS_NAMES)}
+_STATUS_BIT = {s: 1 << (len(STATE_STATUSES)-1-i) for i, s in enumerate(STATE_STATUSES)}
+_BIT_BY_INDEX = [_STATUS_BIT.get(s, 0) for s in STATUS_NAMES]
+_MOOD_INDEX = {m: i for i, m in enumerate(MOODS)}
+# base-4 cooldown digit weight per ability slot; _CD_EMPTY[n] is the code of n filled
+# slots at cooldown 0 (the remaining slots hold digit 3 = no ability)
+_CD_WEIGHTS = [4**(MAX_ABILITIES-1-i) for i in range(MAX_ABILITIES)]
+_CD_EMPTY = [3*sum(_CD_WEIGHTS[n:]) for n in range(MAX_ABILITIES+1)]
+
+EPSILON_DECAY = 0.995
+MIN_EPSILON = 0.05
+DRIFT_CHANCE = 0.02     # chance per update that personality drifts toward the current mood
+LEARNING_RATE = 0.12
+DISCOUNT = 0.95
+MEMORY_LEN = 50         # recent rewards behind the mood score
+PERSONALITY_TRAITS = ("aggressive", "defensive", "balanced")
+_AGGRESSIVE, _DEFENSIVE = 0, 1
+BASE_ACTIONS = ("attack", "defend", "heal")
 
 def clamp(v, lo, hi):
     return max(lo, min(hi, v))
@@ -10,14 +37,244 @@ def clamp(v, lo, hi):
 def hp_bucket(hp):
     return clamp((hp // HP_BUCKET) * HP_BUCKET, 0, MAX_HP)
 
+# (name, array typecode, slots per fighter, initial value) of every FighterBank field
+_BANK_FIELDS = (
+    ("hp", "h", 1, MAX_HP),
+    ("statuses", "h", len(STATUS_NAMES), 0),
+    ("cooldowns", "h", MAX_ABILITIES, 0),
+    ("n_abilities", "h", 1, 0),
+    ("status_bits", "q", 1, 0),             # active STATE_STATUSES as a bitmask
+    ("cd_codes", "q", 1, _CD_EMPTY[0]),     # base-4 digit per ability slot, 3 = empty slot
+    # Q-learning state
+    ("epsilon", "d", 1, 0.0),
+    ("learning_rate", "d", 1, LEARNING_RATE),
+    ("discount", "d", 1, DISCOUNT),
+    ("personality", "d", len(PERSONALITY_TRAITS), 0.0),
+    ("memory", "b", MEMORY_LEN, 0),         # signs of the last MEMORY_LEN rewards, a ring
+    ("memory_len", "h", 1, 0),
+    ("memory_head", "h", 1, 0),
+    ("mood_score", "h", 1, 0),              # sum of the signs in memory
+    ("combo", "h", COMBO_LEN, 0),           # action ids of the last actions, oldest first; -1 = unknown
+    ("combo_len", "h", 1, 0),
+    ("combo_code", "q", 1, 0),              # combo part of the state code
+)
+
+class FighterBank:
+    """Struct-of-arrays storage for many fighters: hp, status turns, ability cooldowns,
+    the packed parts of their state codes and their Q-learning state, as flat
+    small-int/float arrays with `<field>_view` numpy views over the same memory. A
+    Fighter only keeps (bank, row) and indexes these arrays directly;
+    tick_statuses/tick_cooldowns advance every fighter in the bank with a few
+    whole-array operations. The bank doubles in size when full, and rows of
+    collected fighters are reused."""
+    def __init__(self, capacity=64):
+        self.capacity = 0
+        self.size = 0
+        self.free = []
+        for name, code, width, init in _BANK_FIELDS:
+            setattr(self, name, array(code))
+        self._grow(max(1, capacity))
+
+    def _grow(self, capacity):
+        # array.array can't resize while numpy views export its buffer, so drop them first
+        for name, _, _, _ in _BANK_FIELDS:
+            self.__dict__.pop(name + "_view", None)
+        extra = capacity - self.capacity
+        for name, code, width, init in _BANK_FIELDS:
+            getattr(self, name).extend([init]*(extra*width))
+        self.capacity = capacity
+        for name, code, width, init in _BANK_FIELDS:
+            view = np.frombuffer(getattr(self, name), dtype=getattr(self, name).typecode)
+            setattr(self, name + "_view", view.reshape(capacity, width) if width > 1 else view)
+
+    def allocate(self):
+        if self.free:
+            row = self.free.pop()
+            for name, code, width, init in _BANK_FIELDS:
+                getattr(self, name + "_view")[row] = init
+            return row
+        if self.size == self.capacity:
+            self._grow(2*self.capacity)
+        self.size += 1
+        return self.size - 1
+
+    def release(self, row):
+        self.free.append(row)
+
+    def tick_statuses(self):
+        """Fighter.tick_statuses for every fighter at once (without the log lines).
+        Returns the damage-over-time each fighter took."""
+        n = self.size
+        s = self.statuses_view[:n]
+        dmg = (s[:, :len(DOT_DAMAGE)] > 0) @ np.array(DOT_DAMAGE, dtype=np.int16)
+        hp = self.hp_view[:n]
+        np.maximum(hp - dmg, 0, out=hp)
+        ticked = s[:, :TICKED_STATUSES]
+        ticked -= ticked > 0
+        self.status_bits_view[:n] = (s > 0) @ np.array(_BIT_BY_INDEX)
+        return dmg
+
+    def decay_epsilon(self, rows):
+        """The per-update epsilon decay of Fighter.update_q, once per entry of rows."""
+        counts = np.bincount(rows, minlength=self.capacity)
+        np.maximum(self.epsilon_view * EPSILON_DECAY**counts, MIN_EPSILON, out=self.epsilon_view, where=counts > 0)
+
+    def tick_cooldowns(self):
+        """Fighter.tick_cooldowns for every fighter at once."""
+        n = self.size
+        cd = self.cooldowns_view[:n]
+        cd -= cd > 0
+        self.cd_codes_view[:n] = np.minimum(cd, 2) @ np.array(_CD_WEIGHTS) + np.array(_CD_EMPTY)[self.n_abilities_view[:n]]
+
+# standalone fighters (no bank=...) all share this one
+DEFAULT_BANK = FighterBank()
+
+# action name -> id dicts, shared by every fighter with the same action list
+_ACTION_IDS = {}
+
+def _action_ids(actions):
+    actions = tuple(actions)
+    ids = _ACTION_IDS.get(actions)
+    if ids is None:
+        ids = _ACTION_IDS[actions] = {a: i for i, a in enumerate(actions)}
+    return ids
+
+class StatusArray:
+    """One fighter's status turns: a row of its bank's fixed-index status array.
+    Reads like defaultdict(int) (get / [] / clear / iteration); `bits` is a bitmask of
+    the active STATE_STATUSES, kept current on every write."""
+    __slots__ = ("bank", "row")
+
+    def __init__(self, bank, row):
+        self.bank = bank
+        self.row = row
+
+    @property
+    def bits(self):
+        return self.bank.status_bits[self.row]
+
+    @property
+    def counts(self):
+        # a copy: a held view would stop the bank's arrays from growing
+        return self.bank.statuses_view[self.row].copy()
+
+    def get(self, key, default=0):
+        i = _STATUS_INDEX.get(key)
+        return default if i is None else self.bank.statuses[self.row*len(STATUS_NAMES) + i]
+
+    def __getitem__(self, key):
+        return self.bank.statuses[self.row*len(STATUS_NAMES) + _STATUS_INDEX[key]]
+
+    def __setitem__(self, key, value):
+        i = _STATUS_INDEX[key]
+        bank, row = self.bank, self.row
+        bank.statuses[row*len(STATUS_NAMES) + i] = value
+        bit = _BIT_BY_INDEX[i]
+        if bit:
+            if value > 0:
+                bank.status_bits[row] |= bit
+            else:
+                bank.status_bits[row] &= ~bit
+
+    def __iter__(self):
+        return iter(STATUS_NAMES)
+
+    def __contains__(self, key):
+        return key in _STATUS_INDEX
+
+    def items(self):
+        start = self.row*len(STATUS_NAMES)
+        return zip(STATUS_NAMES, self.bank.statuses[start:start+len(STATUS_NAMES)])
+
+    def clear(self):
+        self.bank.statuses_view[self.row] = 0
+        self.bank.status_bits[self.row] = 0
+
+class PersonalityBias:
+    """One fighter's personality weights as a writable dict-like view of its bank row,
+    so `f.personality_bias["aggressive"] += 0.1` updates the fighter. Only the
+    PERSONALITY_TRAITS keys exist."""
+    __slots__ = ("bank", "row")
+
+    def __init__(self, bank, row):
+        self.bank = bank
+        self.row = row
+
+    def _index(self, key):
+        return self.row*len(PERSONALITY_TRAITS) + PERSONALITY_TRAITS.index(key)
+
+    def get(self, key, default=0.0):
+        return self[key] if key in PERSONALITY_TRAITS else default
+
+    def __getitem__(self, key):
+        if key not in PERSONALITY_TRAITS:
+            raise KeyError(key)
+        return self.bank.personality[self._index(key)]
+
+    def __setitem__(self, key, value):
+        if key not in PERSONALITY_TRAITS:
+            raise KeyError(key)
+        self.bank.personality[self._index(key)] = value
+
+    def __iter__(self):
+        return iter(PERSONALITY_TRAITS)
+
+    def __len__(self):
+        return len(PERSONALITY_TRAITS)
+
+    def __contains__(self, key):
+        return key in PERSONALITY_TRAITS
+
+    def keys(self):
+        return PERSONALITY_TRAITS
+
+    def values(self):
+        start = self.row*len(PERSONALITY_TRAITS)
+        return self.bank.personality[start:start+len(PERSONALITY_TRAITS)].tolist()
+
+    def items(self):
+        return zip(PERSONALITY_TRAITS, self.values())
+
+    def update(self, traits):
+        for k, v in dict(traits).items():
+            self[k] = v
+
+    def __eq__(self, other):
+        return dict(self.items()) == dict(other.items()) if hasattr(other, "items") else NotImplemented
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
 class Ability:
+    __slots__ = ("name", "cooldown", "func", "description", "owner", "slot", "_cur_cd")
+
     def __init__(self, name, cooldown=0, func=None, description=""):
         self.name = name
         self.cooldown = cooldown
         self.func = func
-        self.cur_cd = 0
+        # owning Fighter and slot, set by add_ability; an owned ability's cooldown
+        # lives in the owner's bank row
+        self.owner = None
+        self.slot = 0
+        self._cur_cd = 0
         self.description = description
 
+    @property
+    def cur_cd(self):
+        owner = self.owner
+        if owner is not None:
+            return owner.bank.cooldowns[owner.row*MAX_ABILITIES + self.slot]
+        return self._cur_cd
+
+    @cur_cd.setter
+    def cur_cd(self, value):
+        owner = self.owner
+        if owner is not None:
+            owner.bank.cooldowns[owner.row*MAX_ABILITIES + self.slot] = value
+            owner._cooldown_changed(self.slot, value)
+        else:
+            self._cur_cd = value
+
     def ready(self):
         return self.cur_cd == 0
 
@@ -29,54 +286,162 @@ class Ability:
             self.cur_cd -= 1
 
 class Fighter:
-    def __init__(self, name, personality_bias=None):
+    # everything numeric lives in a FighterBank row; the instance holds only references
+    __slots__ = ("name", "rng", "statuses", "abilities", "bank", "row", "_action_ids",
+                 "agent", "q_table", "last_action", "pos", "_bias_cache", "__weakref__")
+    max_hp = MAX_HP
+    base_actions = BASE_ACTIONS
+
+    def __init__(self, name, personality_bias=None, rng=None, bank=None):
         self.name = name
-        self.hp = MAX_HP
-        self.max_hp = MAX_HP
-        self.statuses = defaultdict(int)
+        # random stream for this fighter (also used by its abilities)
+        if rng is not None and not isinstance(rng, BufferedRandom):
+            rng = BufferedRandom(rng)
+        self.rng = rng or default_random()
+        self.bank = bank if bank is not None else DEFAULT_BANK
+        self.row = self.bank.allocate()
+        self.statuses = StatusArray(self.bank, self.row)
         self.abilities = []
-        self.base_actions = ["attack", "defend", "heal"]
+        self._action_ids = _action_ids(self.base_actions)
 
         # optional external controller (Agent from agents.py)
         self.agent = None
 
-        # Q-learning
+        # Q-learning: dict (state tuple -> {action: q}) or an ArrayQTable
         self.q_table = {}
-        self.learning_rate = 0.12
-        self.discount = 0.95
         self.epsilon = 0.18 if name=="AI_One" else 0.25
-        self.memory = deque(maxlen=50)
-        self.combo_memory = deque(maxlen=3)
-        self.personality_bias = personality_bias or {"aggressive":0.0, "defensive":0.0, "balanced":0.0}
+        if personality_bias:
+            self.personality_bias = personality_bias
         self.last_action = None
+        self.pos = None
+        self._bias_cache = None
+
+    def __del__(self):
+        # __init__ may have failed before a row was allocated
+        row = getattr(self, "row", None)
+        if row is not None:
+            self.bank.release(row)
+
+    @property
+    def hp(self):
+        return self.bank.hp[self.row]
+
+    @hp.setter
+    def hp(self, value):
+        self.bank.hp[self.row] = value
+
+    @property
+    def epsilon(self):
+        return self.bank.epsilon[self.row]
+
+    @epsilon.setter
+    def epsilon(self, value):
+        self.bank.epsilon[self.row] = value
+
+    @property
+    def learning_rate(self):
+        return self.bank.learning_rate[self.row]
+
+    @learning_rate.setter
+    def learning_rate(self, value):
+        self.bank.learning_rate[self.row] = value
+
+    @property
+    def discount(self):
+        return self.bank.discount[self.row]
+
+    @discount.setter
+    def discount(self, value):
+        self.bank.discount[self.row] = value
+
+    @property
+    def personality_bias(self):
+        return PersonalityBias(self.bank, self.row)
+
+    @personality_bias.setter
+    def personality_bias(self, traits):
+        start = self.row*len(PERSONALITY_TRAITS)
+        for i, t in enumerate(PERSONALITY_TRAITS):
+            self.bank.personality[start+i] = traits.get(t, 0.0)
+
+    @property
+    def cooldowns(self):
+        # a copy: a held view would stop the bank's arrays from growing
+        return self.bank.cooldowns_view[self.row].copy()
+
+    @property
+    def combo_memory(self):
+        """Names of the last COMBO_LEN actions, oldest first (None for unknown actions)."""
+        names = self.all_actions()
+        start = self.row*COMBO_LEN
+        ids = self.bank.combo[start:start + self.bank.combo_len[self.row]]
+        return tuple(names[i] if i >= 0 else None for i in ids)
+
+    @property
+    def _cd_code(self):
+        return self.bank.cd_codes[self.row]
 
     def clamp_hp(self):
         self.hp = clamp(self.hp, 0, self.max_hp)
 
     def add_ability(self, ability):
+        slot = len(self.abilities)
+        if slot == MAX_ABILITIES:
+            raise ValueError(f"a fighter can have at most {MAX_ABILITIES} abilities")
+        cur = ability.cur_cd
+        ability.owner = self
+        ability.slot = slot
         self.abilities.append(ability)
+        bank, row = self.bank, self.row
+        bank.n_abilities[row] = len(self.abilities)
+        bank.cd_codes[row] = _CD_EMPTY[len(self.abilities)] + sum(
+            min(2, bank.cooldowns[row*MAX_ABILITIES + i]) * _CD_WEIGHTS[i] for i in range(slot))
+        ability.cur_cd = cur
+        self._action_ids = _action_ids(self.all_actions())
+        self._update_combo_code()
+
+    def _cooldown_changed(self, slot, cur_cd):
+        shift = 2*(MAX_ABILITIES-1-slot)
+        codes = self.bank.cd_codes
+        codes[self.row] = (codes[self.row] & ~(3 << shift)) | (min(2, cur_cd) << shift)
+
+    def _update_combo_code(self):
+        # combo digits as in ArrayQTable.encode: 0 = empty, action id + 1, radix-1 = unknown
+        bank, row = self.bank, self.row
+        radix = len(self._action_ids) + 2
+        n = bank.combo_len[row]
+        code = 0
+        for a in bank.combo[row*COMBO_LEN:row*COMBO_LEN + n]:
+            code = code*radix + (a if a >= 0 else radix - 2) + 1
+        bank.combo_code[row] = code * radix**(COMBO_LEN - n)
 
     def tick_cooldowns(self):
-        for a in self.abilities:
-            a.tick()
+        # single fighter: a short loop over its cooldown row (FighterBank.tick_cooldowns
+        # does the same for a whole bank in array operations)
+        cds, base = self.bank.cooldowns, self.row*MAX_ABILITIES
+        for i in range(len(self.abilities)):
+            if cds[base+i] > 0:
+                cds[base+i] -= 1
+                self._cooldown_changed(i, cds[base+i])
 
     def tick_statuses(self):
         logs = []
+        c, base = self.bank.statuses, self.row*len(STATUS_NAMES)
         # Damage over time stronger
-        for status, dmg in [("burn",5),("poison",4),("bleed",6)]:
-            if self.statuses.get(status,0) > 0:
+        for i, dmg in enumerate(DOT_DAMAGE):
+            if c[base+i] > 0:
                 self.hp -= dmg
-                self.statuses[status] -= 1
-                logs.append(f"{self.name} suffers {status} for {dmg} damage.")
+                self.statuses[STATUS_NAMES[i]] = c[base+i] - 1
+                logs.append(f"{self.name} suffers {STATUS_NAMES[i]} for {dmg} damage.")
                 self.clamp_hp()
         # Cooldowns for basic actions
-        for cd in ["heal_cd","defend_cd"]:
-            if self.statuses.get(cd,0) > 0:
-                self.statuses[cd] -= 1
+        for i in range(len(DOT_DAMAGE), TICKED_STATUSES):
+            if c[base+i] > 0:
+                c[base+i] -= 1
         return logs
 
     def derive_mood(self):
-        score = sum(1 if r>0 else -1 if r<0 else 0 for r in self.memory)
+        score = self.bank.mood_score[self.row]
         if self.hp < self.max_hp*0.3: return "scared"
         if score >= 2: return "aggressive"
         if score <= -2: return "defensive"
@@ -91,6 +456,27 @@ class Fighter:
         combo_state = tuple(self.combo_memory)
         return (*hp_state, my_cds, opp_cds, statuses, opp_statuses, self.derive_mood(), opponent.derive_mood(), combo_state)
 
+    def state_code(self, opponent):
+        """Integer form of get_state_key (same value as ArrayQTable.encode), assembled
+        from running counters in O(1) without building any tuples."""
+        if len(self.abilities) > MAX_ABILITIES or len(opponent.abilities) > MAX_ABILITIES:
+            raise ValueError(f"state codes support at most {MAX_ABILITIES} abilities")
+        code = clamp(self.hp // HP_BUCKET, 0, 10)*11 + clamp(opponent.hp // HP_BUCKET, 0, 10)
+        code = (code << 2*MAX_ABILITIES | self._cd_code) << 2*MAX_ABILITIES | opponent._cd_code
+        code = (code << len(STATE_STATUSES) | self.statuses.bits) << len(STATE_STATUSES) | opponent.statuses.bits
+        code = (code*4 + _MOOD_INDEX[self.derive_mood()])*4 + _MOOD_INDEX[opponent.derive_mood()]
+        return code * (len(self._action_ids) + 2)**COMBO_LEN + self.bank.combo_code[self.row]
+
+    def state_key(self, opponent):
+        """State as used by this fighter's Q-table: int code for an ArrayQTable, tuple for a dict."""
+        if isinstance(self.q_table, ArrayQTable):
+            return self.state_code(opponent)
+        return self.get_state_key(opponent)
+
+    def all_actions(self):
+        """Every action this fighter can ever take (Q-table action vocabulary)."""
+        return list(self.base_actions) + [a.name for a in self.abilities]
+
     def available_actions(self):
         acts = list(self.base_actions)
         acts.extend(a.name for a in self.abilities if a.ready())
@@ -108,12 +494,12 @@ class Fighter:
             opp_hp_frac = opponent.hp / opponent.max_hp
             own_shield = 1.0 if self.statuses.get("shield", 0) > 0 else 0.0
             opp_shield = 1.0 if opponent.statuses.get("shield", 0) > 0 else 0.0
-            noise = random.random()
+            noise = self.rng.random()
             features = [own_hp_frac, opp_hp_frac, own_shield, opp_shield, noise]
             try:
                 choice = self.agent.act(features)
             except Exception:
-                choice = random.choice(self.available_actions())
+                choice = self.rng.choice(self.available_actions())
 
             # Map agent 'power' to an available ability name if present
             if choice == "power":
@@ -131,7 +517,7 @@ class Fighter:
                 self.last_action = choice
                 return choice
             # Otherwise fallback
-            self.last_action = random.choice(self.available_actions())
+            self.last_action = self.rng.choice(self.available_actions())
             return self.last_action
 
         # Heal only when really low
@@ -145,13 +531,16 @@ class Fighter:
                     self.last_action = "Recharge"
                     return "Recharge"
 
-        state = self.get_state_key(opponent)
+        state = self.state_key(opponent)
         actions = self.available_actions()
         if not actions:
             actions = ["attack"]
 
-        if random.random() < self.epsilon or state not in self.q_table:
-            choice = random.choice(actions)
+        if isinstance(self.q_table, ArrayQTable):
+            return self._choose_from_array(state, actions, opponent)
+
+        if self.rng.random() < self.epsilon or state not in self.q_table:
+            choice = self.rng.choice(actions)
             self.last_action = choice
             return choice
 
@@ -159,23 +548,69 @@ class Fighter:
         qvals = self.q_table.get(state,{})
         best = None
         best_score = -1e9
+        # the exploit bias keys on the opponent's mood (state[-2]), as it always has
         mood = state[-2]
+        aggressive = self.bank.personality[self.row*len(PERSONALITY_TRAITS) + _AGGRESSIVE]
         for a in actions:
             base_v = qvals.get(a,0.0)
             bias = 0.0
             if mood=="aggressive" and "attack" in a: bias += 0.08
             if mood=="defensive" and ("heal" in a or "defend" in a): bias += 0.06
-            if self.personality_bias.get("aggressive",0) and "attack" in a: bias += self.personality_bias["aggressive"]
+            if aggressive and "attack" in a: bias += aggressive
             if opponent.statuses.get("stunned",0) > 0 and ("attack" in a or a in [ab.name for ab in self.abilities]):
                 bias += 0.05
-            score = base_v + bias + random.random()*1e-6
+            score = base_v + bias + self.rng.random()*1e-6
             if score > best_score:
                 best_score = score
                 best = a
         self.last_action = best
         return best
 
+    def _choose_from_array(self, state, actions, opponent):
+        # same policy as the dict path (mood bias from the opponent's mood), scored over
+        # the whole action row at once
+        table = self.q_table
+        row = table.find(state)
+        if self.rng.random() < self.epsilon or row < 0:
+            choice = self.rng.choice(actions)
+            self.last_action = choice
+            return choice
+        # tiny random tie-breaker, as in the dict path
+        bias = self._action_bias(opponent.derive_mood(), opponent) + self.rng.generator.random(len(table.actions))*1e-6
+        self.last_action = table.best(row, table.mask(actions), bias)
+        return self.last_action
+
+    def _action_bias(self, mood, opponent):
+        # per-action exploit bias as a vector over q_table.actions
+        table = self.q_table
+        cache = self._bias_cache
+        if cache is None or cache[0] is not table:
+            names = [ab.name for ab in self.abilities]
+            is_attack = np.array(["attack" in a for a in table.actions])
+            is_guard = np.array(["heal" in a or "defend" in a for a in table.actions])
+            cache = self._bias_cache = (table, is_attack, is_guard, is_attack | np.array([a in names for a in table.actions]))
+        _, is_attack, is_guard, is_offense = cache
+        aggressive = self.bank.personality[self.row*len(PERSONALITY_TRAITS) + _AGGRESSIVE]
+        bias = np.zeros(len(table.actions))
+        if mood=="aggressive": bias += 0.08*is_attack
+        if mood=="defensive": bias += 0.06*is_guard
+        if aggressive: bias += aggressive*is_attack
+        if opponent.statuses.get("stunned",0) > 0: bias += 0.05*is_offense
+        return bias
+
     def update_q(self,state,action,reward,next_state):
+        if isinstance(self.q_table, ArrayQTable):
+            table = self.q_table
+            actions = self.available_actions()
+            row = table.add(state, actions)
+            next_row = table.add(next_state, actions)
+            current = table.get(row, action)
+            future = table.max_q(next_row)
+            table.set(row, action, current + self.learning_rate*(reward + self.discount*future - current))
+            table.trim()
+            self._after_update(action, reward)
+            return
+
         if state not in self.q_table:
             self.q_table[state] = {a:0.0 for a in self.available_actions()}
         if next_state not in self.q_table:
@@ -186,15 +621,41 @@ class Fighter:
         current = self.q_table[state][action]
         future = max(self.q_table[next_state].values(),default=0.0)
         self.q_table[state][action] = current + self.learning_rate*(reward + self.discount*future - current)
-        self.memory.append(reward)
-        self.combo_memory.append(action)
-
-        if random.random() < 0.02:
-            mood = self.derive_mood()
-            if mood=="aggressive": self.personality_bias["aggressive"] += 0.001
-            if mood=="defensive": self.personality_bias["defensive"] += 0.001
-
-        self.epsilon = max(0.05,self.epsilon*0.995)
+        self._after_update(action, reward)
+
+    def _after_update(self, action, reward):
+        self._remember(action, reward)
+        if self.rng.random() < DRIFT_CHANCE:
+            self._drift()
+        self.epsilon = max(MIN_EPSILON,self.epsilon*EPSILON_DECAY)
+
+    def _remember(self, action, reward):
+        # keep the running mood score in step with the memory window
+        bank, row = self.bank, self.row
+        sign = 1 if reward>0 else -1 if reward<0 else 0
+        n, head = bank.memory_len[row], bank.memory_head[row]
+        if n == MEMORY_LEN:
+            bank.mood_score[row] -= bank.memory[row*MEMORY_LEN + head]
+        else:
+            bank.memory_len[row] = n + 1
+        bank.memory[row*MEMORY_LEN + head] = sign
+        bank.memory_head[row] = (head + 1) % MEMORY_LEN
+        bank.mood_score[row] += sign
+        # combo: shift the action ids left when full
+        start, n = row*COMBO_LEN, bank.combo_len[row]
+        if n == COMBO_LEN:
+            bank.combo[start:start+COMBO_LEN-1] = bank.combo[start+1:start+COMBO_LEN]
+            n -= 1
+        bank.combo[start+n] = self._action_ids.get(action, -1)
+        bank.combo_len[row] = n + 1
+        self._update_combo_code()
+
+    def _drift(self):
+        # personality slowly follows mood
+        mood = self.derive_mood()
+        start = self.row*len(PERSONALITY_TRAITS)
+        if mood=="aggressive": self.bank.personality[start + _AGGRESSIVE] += 0.001
+        if mood=="defensive": self.bank.personality[start + _DEFENSIVE] += 0.001
 
     def perform_action(self, action_name, opponent):
         reward = 0.0
@@ -206,7 +667,7 @@ class Fighter:
             sneak = True
 
         if action_name=="attack":
-            dmg = random.randint(8,14)
+            dmg = self.rng.randint(8,14)
             if self.statuses.get("charged",0) > 0:
                 dmg = int(dmg*1.5)
                 self.statuses["charged"] = 0
@@ -234,7 +695,7 @@ class Fighter:
                 log = f"{self.name} tries to heal but must wait!"
                 reward -= 0.05
             else:
-                heal = random.randint(4,8)
+                heal = self.rng.randint(4,8)
                 self.hp += heal
                 self.clamp_hp()
                 self.statuses["heal_cd"] = 2
@@ -249,7 +710,7 @@ class Fighter:
                     reward += r
                     break
             else:
-                dmg = random.randint(6,10)
+                dmg = self.rng.randint(6,10)
                 opponent.hp -= dmg
                 opponent.clamp_hp()
                 log += f"{self.name} fallback attack for {dmg} damage."
@@ -270,3 +731,48 @@ class Fighter:
         reward += 0.01*(self.hp/self.max_hp)
 
         return log, reward
+
+
+class TransitionBatch:
+    """Q-learning transitions collected from many fighters (e.g. environments run in
+    lockstep) and applied together by flush(): one scatter-add TD update per Q-table,
+    then epsilon decay and personality drift for the whole batch. Memory and combo
+    history are still updated at add() time since they are part of the next state.
+    The fighters must use ArrayQTables."""
+    def __init__(self, rng=None):
+        self.rng = rng if rng is not None else default_random().generator
+        self.items = []
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, fighter, state, action, reward, next_state):
+        fighter._remember(action, reward)
+        mask = fighter.q_table.mask(fighter.available_actions())
+        self.items.append((fighter, state, action, reward, next_state, mask))
+
+    def flush(self):
+        if not self.items:
+            return
+        by_table = {}
+        for item in self.items:
+            by_table.setdefault(id(item[0].q_table), []).append(item)
+        for items in by_table.values():
+            table = items[0][0].q_table
+            fighters, states, actions, rewards, next_states, masks = zip(*items)
+            masks = np.stack(masks)
+            rows = table.add_codes(states, masks)
+            next_rows = table.add_codes(next_states, masks)
+            table.td_update(rows, np.array([table.action_index[a] for a in actions]), np.array(rewards),
+                            next_rows, np.array([f.learning_rate for f in fighters]),
+                            np.array([f.discount for f in fighters]))
+            table.trim()
+        fighters = [item[0] for item in self.items]
+        for f in np.array(fighters, dtype=object)[self.rng.random(len(fighters)) < DRIFT_CHANCE]:
+            f._drift()
+        by_bank = {}
+        for f in fighters:
+            by_bank.setdefault(id(f.bank), (f.bank, []))[1].append(f.row)
+        for bank, rows in by_bank.values():
+            bank.decay_epsilon(np.array(rows))
+        self.items = []
@@ -1,10 +1,22 @@
-import random
+import hashlib
+import time
 import numpy as np
 import pickle
-from agents import Agent
-from battle import simulate_fight
+from concurrent.futures import ProcessPoolExecutor
+from agents import Agent, Population, breed
+from battle import simulate_fights, A_WINS, B_WINS
+from seeding import stream, default_rng
+from tournament import round_robin_pairs, random_pairs, fight_points, elo_ratings
+from exact import policy_probs, solve
+from checkpoint import CHECKPOINT_PATH, CheckpointWriter, check_layout, load_checkpoint
+from profiling import PROFILER, CProfileHook, TraceWriter, summary
+
+# spawn_key layout under the master seed: (generation, EVAL_STREAM|REPRO_STREAM)
+EVAL_STREAM, REPRO_STREAM = 0, 1
 
 BEST_PATH = "best_agent.pkl"
+EXACT_TASK_SIZE = 8         # pairings per exact-evaluation task
+RACING_ROUND_WEIGHT = 10.0  # racing scores: per round survived, above the 0-2 mean fight score
 
 class GASettings:
     population = 60
@@ -13,78 +25,449 @@ class GASettings:
     mutation_rate = 0.12
     mutation_scale = 0.18
     evaluate_rounds = 4
+    workers = 1         # >1 evaluates fights in a process pool
+    seed = None         # master seed; set it to make runs reproducible
+    block_size = 32     # fights per seeded block (fixed, so results don't depend on workers)
+    tasks_per_worker = 2    # pool tasks per worker per batch of fights
+    fitness_cache = True    # only used by the "sample" evaluator
+    cache_max_fights = 16   # cached agents stop playing once their estimate has this many fights
+    cache_ttl = 3           # generations a cached fight counts before it expires
+    evaluator = "tournament"    # "tournament" (shared fights + Elo), "sample" (random opponents per agent)
+                                # "racing" (successive halving over random opponents)
+                                # or "exact" (random pairings solved exactly, see exact.py)
+    tournament_rounds = 8       # fights per agent from random pairings; 0 = full round robin
+    racing_initial = 2          # racing: fights per agent in the first round
+    racing_budget = None        # racing: total fights per generation; None = population * evaluate_rounds
+    checkpoint_every = 1        # generations between background checkpoints (0 disables)
+    profile = False             # per-phase timers and fight counters in every generation report
+    trace_path = None           # append each generation's metrics to this JSONL file
+    cprofile_path = None        # run the whole training under cProfile and dump the stats here
+    islands = 1                 # >1 runs the island model (islands.py): this many populations, one process each
+    migration_interval = 5      # generations between migrations
+    migrants = 2                # top agents each island sends to the next one
+
+
+class FitnessCache:
+    """Fight results accumulated per agent across generations.
+    Keyed by a hash of the agent's parameters plus the evaluation context, so an elite
+    carried over unchanged refines its estimate (up to max_fights) and then reuses it
+    instead of replaying fights. Opponents come from the current population, so each
+    generation's results are kept apart and expire ttl generations later: estimates
+    only cover recent opponents and are topped up again as old fights drop out.
+    Entries are evicted once all their fights have expired."""
+    def __init__(self, max_fights=16, ttl=3):
+        self.max_fights = max_fights
+        self.ttl = ttl
+        self.entries = {}   # key -> list of [generation, fights, wins, score_sum]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(weights, bias, context):
+        h = hashlib.blake2b(repr(context).encode(), digest_size=16)
+        h.update(np.ascontiguousarray(weights).tobytes())
+        h.update(np.ascontiguousarray(bias).tobytes())
+        return h.digest()
+
+    def lookup(self, key):
+        """(fights, wins, score_sum) over the entry's unexpired fights, or None."""
+        if key not in self.entries:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self.totals(key)
+
+    def totals(self, key):
+        fights, wins, score = 0, 0.0, 0.0
+        for _, f, w, sc in self.entries[key]:
+            fights, wins, score = fights + f, wins + w, score + sc
+        return fights, wins, score
+
+    def add(self, key, fights, wins, score, generation):
+        self.entries.setdefault(key, []).append([generation, fights, wins, score])
+
+    def evict(self, generation):
+        # drop fights played ttl or more generations ago, then entries left empty
+        for key in list(self.entries):
+            records = [r for r in self.entries[key] if generation - r[0] < self.ttl]
+            if records:
+                self.entries[key] = records
+            else:
+                del self.entries[key]
+                self.evictions += 1
+
+    def stats(self):
+        return f"cache hits={self.hits} misses={self.misses} evictions={self.evictions} size={len(self.entries)}"
+
+
+def _exact_task(task):
+    # runs in a pool worker: exact outcomes for a chunk of pairings, each agent's
+    # policy tables built once per chunk
+    weights, bias, idx_a, idx_b, max_turns = task
+    probs = {}
+    out = np.empty((len(idx_a), 4))
+    for k, (i, j) in enumerate(zip(idx_a.tolist(), idx_b.tolist())):
+        for m in (i, j):
+            if m not in probs:
+                probs[m] = policy_probs(weights[m], bias[m])
+        o = solve(probs[i], probs[j], max_turns=max_turns)
+        out[k] = o.a_wins, o.b_wins, o.a_score, o.b_score
+    return out
+
+
+def _fight_task(task):
+    # runs in a pool worker: only plain arrays and SeedSequences cross the process boundary
+    wa, ba, wb, bb, block_seqs, block, count = task
+    decisions = np.zeros(len(wa), dtype=np.int64) if count else None
+    rngs = [np.random.default_rng(s) for s in block_seqs]
+    winner, a_hp, _ = simulate_fights(wa, ba, wb, bb, rng=rngs, decisions=decisions, block=block)
+    return winner, a_hp, decisions
+
+
+def make_executor(workers=None):
+    workers = GASettings.workers if workers is None else workers
+    return ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+
+
+def play_matchups(pop, idx_a, idx_b, executor=None, seq=None):
+    """Play pop[idx_a[i]] vs pop[idx_b[i]] for all i; returns (winner, a_hp) arrays.
+    Fights are seeded in fixed blocks of GASettings.block_size from children of seq.
+    Serially all blocks are played in one batched call; with an executor they are
+    grouped into about tasks_per_worker tasks per worker. Either way every fight
+    gets the same stream, so results don't depend on the number of workers."""
+    if len(idx_a) == 0:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int)
+    seq = seq if seq is not None else np.random.SeedSequence()
+    block = GASettings.block_size
+    block_seqs = seq.spawn(-(-len(idx_a) // block))
+    tasks_wanted = max(1, GASettings.workers * GASettings.tasks_per_worker) if executor else 1
+    per_task = -(-len(block_seqs) // tasks_wanted)
+    size = per_task * block
+    tasks = [(idx_a[t*size:(t+1)*size], idx_b[t*size:(t+1)*size], block_seqs[t*per_task:(t+1)*per_task])
+             for t in range(-(-len(block_seqs) // per_task))]
+    count = PROFILER.enabled
+    payloads = [(pop.weights[ia], pop.bias[ia], pop.weights[ib], pop.bias[ib], s, block, count) for ia, ib, s in tasks]
+    with PROFILER.phase("simulate"):
+        outcomes = list(executor.map(_fight_task, payloads)) if executor else [_fight_task(p) for p in payloads]
+    if count:
+        # decision counts come back from the workers; a fight's turns are A's decisions
+        decisions = np.concatenate([o[2] for o in outcomes])
+        PROFILER.count("fights", len(decisions))
+        PROFILER.count("decisions", int(decisions.sum()))
+        PROFILER.count("turns", int(((decisions + 1)//2).sum()))
+    return np.concatenate([o[0] for o in outcomes]), np.concatenate([o[1] for o in outcomes])
+
+
+def fight_scores(winner, a_hp):
+    # per-fight score for side A: win 1 + hp/100, loss hp/100, draw 0.5
+    return np.where(winner==A_WINS, 1.0 + a_hp/100.0, np.where(winner==B_WINS, a_hp/100.0, 0.5))
+
+
+def evaluate_agent(agent, population, rounds=4, rng=None):
+    """One agent against `rounds` distinct opponents picked from population, played
+    as one batched call and scored as in fight_scores. Returns (win_rate, avg_score)."""
+    rng = rng or default_rng()
+    picks = rng.choice(len(population), min(len(population), rounds), replace=False)
+    opponents = [population[i] for i in picks]
+    m = len(opponents)
+    winner, a_hp, _ = simulate_fights(np.repeat(agent.weights[None], m, axis=0), np.repeat(agent.bias[None], m, axis=0),
+                                      np.stack([o.weights for o in opponents]), np.stack([o.bias for o in opponents]),
+                                      rng=rng)
+    return float(np.mean(winner==A_WINS)), float(fight_scores(winner, a_hp).mean())
+
+
+def evaluate_population(population, rounds=4, executor=None, seed=None, generation=0, cache=None):
+    """Every agent fights `rounds` random opponents, scored as in fight_scores,
+    played as batched calls.
+    With an executor the fights are split into tasks spread over the pool.
+    With a seed, matchups and every task are seeded from (seed, generation), so the
+    results are identical whatever the number of workers.
+    With a FitnessCache, agents already in the cache refine or reuse their estimate.
+    Returns a list of (win_rate, avg_score) aligned with population."""
+    n = len(population)
+    k = min(n, rounds)
+    pop = population if isinstance(population, Population) else Population.from_agents(population)
+
+    need = np.arange(n)
+    if cache is not None:
+        context = (seed, rounds)
+        keys = [FitnessCache.key(pop.weights[i], pop.bias[i], context) for i in range(n)]
+        entries = [cache.lookup(key) for key in keys]
+        need = np.array([i for i, e in enumerate(entries) if e is None or e[0] < cache.max_fights], dtype=int)
 
+    eval_seq = np.random.SeedSequence(seed, spawn_key=(generation, EVAL_STREAM))
+    match_seq, fights_seq = eval_seq.spawn(2)
+    match_rng = np.random.default_rng(match_seq)
+    # matchups are drawn for everyone so cached agents don't shift the others' opponents
+    opponents = np.stack([match_rng.choice(n, k, replace=False) for _ in range(n)])
+    idx_a = np.repeat(need, k)
+    idx_b = opponents[need].ravel()
+    winner, a_hp = play_matchups(pop, idx_a, idx_b, executor, fights_seq)
+    wins = np.bincount(idx_a, weights=(winner==A_WINS), minlength=n)
+    scores = np.bincount(idx_a, weights=fight_scores(winner, a_hp), minlength=n)
+    if cache is None:
+        return list(zip((wins/k).tolist(), (scores/k).tolist()))
 
-def evaluate_agent(agent, population, rounds=4):
-    # play against a few opponents randomly chosen from population
-    opponents = random.sample(population, min(len(population), rounds))
-    wins = 0
-    score = 0.0
-    for opp in opponents:
-        winner, a_hp, b_hp, _ = simulate_fight(agent, opp)
-        if winner=="A":
-            wins += 1
-            score += 1.0 + (a_hp/100.0)
-        elif winner=="B":
-            score += (a_hp/100.0)
+    for i in need:
+        cache.add(keys[i], k, wins[i], scores[i], generation)
+    totals = [cache.totals(key) for key in keys]
+    return [(w/f, sc/f) for f, w, sc in totals]
+
+
+def evaluate_tournament(population, rounds=8, executor=None, seed=None, generation=0):
+    """Tournament evaluation: each fight result is shared by both participants and
+    Elo ratings are fitted to the whole generation's outcomes.
+    rounds=0 plays a full round robin, otherwise `rounds` random pairings per agent.
+    Returns a list of (win_rate, rating) aligned with population."""
+    n = len(population)
+    pop = population if isinstance(population, Population) else Population.from_agents(population)
+    eval_seq = np.random.SeedSequence(seed, spawn_key=(generation, EVAL_STREAM))
+    match_seq, fights_seq = eval_seq.spawn(2)
+    match_rng = np.random.default_rng(match_seq)
+    if rounds:
+        idx_a, idx_b = random_pairs(n, rounds, match_rng)
+    else:
+        idx_a, idx_b = round_robin_pairs(n, match_rng)
+    winner, _ = play_matchups(pop, idx_a, idx_b, executor, fights_seq)
+    points = fight_points(winner)
+    with PROFILER.phase("ratings"):
+        ratings = elo_ratings(n, idx_a, idx_b, points)
+    games = np.bincount(idx_a, minlength=n) + np.bincount(idx_b, minlength=n)
+    wins = np.bincount(idx_a, points==1.0, n) + np.bincount(idx_b, points==0.0, n)
+    return list(zip((wins/np.maximum(games, 1)).tolist(), ratings.tolist()))
+
+
+def evaluate_racing(population, elite_n, budget=None, initial=2, executor=None, seed=None, generation=0):
+    """Successive halving over random opponents, scored as in fight_scores: every
+    agent plays `initial` fights, then each round the better-scoring half goes on
+    (until at most 2*elite_n are left) and the remaining budget is split evenly over
+    the rounds left, the final round taking all of it, so the agents competing for
+    elite slots get the most fights. budget is the total number of fights (default
+    len(population)*4) and is never exceeded; a round's share is spread as evenly
+    as it divides, the spare fights going to the best-ranked agents.
+    Returns a list of (win_rate, racing_score) aligned with population, where
+    racing_score = RACING_ROUND_WEIGHT * rounds survived + mean fight score, so
+    agents that went further always rank above those dropped earlier."""
+    n = len(population)
+    pop = population if isinstance(population, Population) else Population.from_agents(population)
+    budget = n*4 if budget is None else budget
+    elite_n = max(1, min(elite_n, n))
+    # halve the field until it is down to at most twice the elite slots
+    rounds, size = 1, n
+    while size > 2*elite_n:
+        rounds, size = rounds + 1, -(-size // 2)
+    eval_seq = np.random.SeedSequence(seed, spawn_key=(generation, EVAL_STREAM))
+    match_seq, *round_seqs = eval_seq.spawn(rounds + 1)
+    match_rng = np.random.default_rng(match_seq)
+    fights = np.zeros(n)
+    wins = np.zeros(n)
+    scores = np.zeros(n)
+    survived = np.zeros(n)
+    alive = np.arange(n)
+    left = budget
+    for r in range(rounds):
+        if r == rounds - 1:
+            share = left
+        elif r == 0:
+            share = min(initial * n, left)
         else:
-            score += 0.5
-    # average
-    return wins/len(opponents), score/len(opponents)
-
-
-def run_generation(pop):
-    # evaluate all
-    results = []
-    for i,agent in enumerate(pop):
-        win_rate, avg_score = evaluate_agent(agent, pop, rounds=GASettings.evaluate_rounds)
-        results.append((agent, win_rate, avg_score))
-    # sort by avg_score
-    results.sort(key=lambda x: x[2], reverse=True)
+            share = left // (rounds - r)
+        # alive is best first after the first round, so the remainder goes to the leaders
+        per_agent = np.full(len(alive), share // len(alive))
+        per_agent[:share % len(alive)] += 1
+        idx_a = np.repeat(alive, per_agent)
+        if len(idx_a):
+            # any opponent but itself
+            idx_b = (idx_a + match_rng.integers(1, n, len(idx_a))) % n if n > 1 else idx_a
+            winner, a_hp = play_matchups(pop, idx_a, idx_b, executor, round_seqs[r])
+            left -= len(idx_a)
+            fights += np.bincount(idx_a, minlength=n)
+            wins += np.bincount(idx_a, weights=(winner==A_WINS), minlength=n)
+            scores += np.bincount(idx_a, weights=fight_scores(winner, a_hp), minlength=n)
+        survived[alive] = r
+        if r < rounds - 1:
+            means = scores[alive] / np.maximum(fights[alive], 1)
+            alive = alive[np.argsort(-means, kind="stable")[:-(-len(alive) // 2)]]
+    means = scores / np.maximum(fights, 1)
+    return list(zip((wins / np.maximum(fights, 1)).tolist(), (RACING_ROUND_WEIGHT*survived + means).tolist()))
+
+
+def evaluate_exact(population, rounds=4, executor=None, seed=None, generation=0, max_turns=200):
+    """Zero-variance evaluation: `rounds` random perfect matchings, every pairing solved
+    exactly by exact.solve and counted for both sides. Returns a list of
+    (win_rate, avg_score) aligned with population, where win_rate is the mean win
+    probability and avg_score the mean expected fight_scores score."""
+    n = len(population)
+    pop = population if isinstance(population, Population) else Population.from_agents(population)
+    match_rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(generation, EVAL_STREAM)))
+    idx_a, idx_b = random_pairs(n, rounds, match_rng)
+    size = EXACT_TASK_SIZE
+    tasks = [(pop.weights, pop.bias, idx_a[t:t+size], idx_b[t:t+size], max_turns) for t in range(0, len(idx_a), size)]
+    with PROFILER.phase("simulate"):
+        outcomes = list(executor.map(_exact_task, tasks)) if executor else [_exact_task(t) for t in tasks]
+    out = np.concatenate(outcomes) if outcomes else np.empty((0, 4))
+    games = np.maximum(np.bincount(idx_a, minlength=n) + np.bincount(idx_b, minlength=n), 1)
+    wins = np.bincount(idx_a, out[:, 0], n) + np.bincount(idx_b, out[:, 1], n)
+    scores = np.bincount(idx_a, out[:, 2], n) + np.bincount(idx_b, out[:, 3], n)
+    PROFILER.count("solves", len(idx_a))
+    return list(zip((wins/games).tolist(), (scores/games).tolist()))
+
+
+def run_generation(pop, executor=None, generation=0, cache=None, seed=None):
+    # evaluate all in one batch (or spread over the pool)
+    seed = GASettings.seed if seed is None else seed
+    if GASettings.evaluator == "tournament":
+        evals = evaluate_tournament(pop, rounds=GASettings.tournament_rounds, executor=executor,
+                                    seed=seed, generation=generation)
+    elif GASettings.evaluator == "exact":
+        evals = evaluate_exact(pop, rounds=GASettings.evaluate_rounds, executor=executor,
+                               seed=seed, generation=generation)
+    elif GASettings.evaluator == "racing":
+        n = len(pop)
+        budget = GASettings.racing_budget or n*GASettings.evaluate_rounds
+        evals = evaluate_racing(pop, max(1, int(n * GASettings.elite_frac)), budget, GASettings.racing_initial,
+                                executor=executor, seed=seed, generation=generation)
+    else:
+        evals = evaluate_population(pop, rounds=GASettings.evaluate_rounds, executor=executor,
+                                    seed=seed, generation=generation, cache=cache)
+    if cache is not None:
+        cache.evict(generation)
+    results = [(agent, win_rate, avg_score) for agent, (win_rate, avg_score) in zip(pop, evals)]
+    # sort by avg_score (Elo rating for tournaments)
+    with PROFILER.phase("sort"):
+        results.sort(key=lambda x: x[2], reverse=True)
     return results
 
 
-def evolve(pop):
-    results = run_generation(pop)
+def evolve(pop, executor=None, generation=0, rng=None, cache=None, seed=None):
+    seed = GASettings.seed if seed is None else seed
+    results = run_generation(pop, executor=executor, generation=generation, cache=cache, seed=seed)
+    rng = rng or stream(seed, generation, REPRO_STREAM)
     N = len(pop)
     elite_n = max(1, int(N * GASettings.elite_frac))
-    elites = [r[0] for r in results[:elite_n]]
-    new_pop = elites.copy()
-    # fill rest
-    while len(new_pop) < N:
-        a,b = random.sample(elites, 2) if len(elites)>1 else (elites[0], elites[0])
-        child = Agent.crossover(a,b, mix_rate=0.5)
-        child.mutate(rate=GASettings.mutation_rate, scale=GASettings.mutation_scale)
-        new_pop.append(child)
+    with PROFILER.phase("reproduce"):
+        elite_w = np.stack([r[0].weights for r in results[:elite_n]])
+        elite_b = np.stack([r[0].bias for r in results[:elite_n]])
+        # every child of the generation in one batch of array ops
+        child_w, child_b = breed(elite_w, elite_b, N - elite_n, mix_rate=0.5, rate=GASettings.mutation_rate,
+                                 scale=GASettings.mutation_scale, rng=rng)
+        new_pop = Population(np.concatenate([elite_w, child_w]), np.concatenate([elite_b, child_b]))
     return new_pop, results
 
 
-def train_and_save(pop_size=GASettings.population, generations=GASettings.generations, status_cb=None):
+def train_and_save(pop_size=GASettings.population, generations=GASettings.generations, status_cb=None, resume=False,
+                   progress_cb=None):
     """Train GA and optionally report progress via status_cb(message).
-    status_cb: callable that accepts a single string (like self.log in GUI)."""
-    pop = [Agent() for _ in range(pop_size)]
-    best = None
-    for gen in range(1,generations+1):
-        pop, results = evolve(pop)
+    status_cb: callable that accepts a single string (like self.log in GUI).
+    resume: continue from CHECKPOINT_PATH up to `generations` total generations.
+    With GASettings.islands > 1, pop_size is the size of each island.
+    progress_cb: callable that receives generation_metrics() once per generation.
+    Both callbacks run on the training thread.
+    GASettings.profile / trace_path / cprofile_path switch on the instrumentation."""
+    # island workers play their own fights; the fight pool is for the single population
+    executor = make_executor() if GASettings.islands <= 1 else None
+    writer = CheckpointWriter(CHECKPOINT_PATH) if GASettings.checkpoint_every else None
+    trace = TraceWriter(GASettings.trace_path) if GASettings.trace_path else None
+    PROFILER.enabled = GASettings.profile
+    PROFILER.reset()
+    try:
+        with CProfileHook(GASettings.cprofile_path):
+            if GASettings.islands > 1:
+                from islands import train_islands
+                best = train_islands(pop_size, generations, status_cb, writer, resume, progress_cb, trace)
+            else:
+                best = _train_loop(pop_size, generations, status_cb, executor, writer, resume, progress_cb, trace)
+    finally:
+        PROFILER.enabled = False
+        if executor:
+            executor.shutdown()
+        if writer:
+            writer.close()
+        if trace:
+            trace.close()
+    if GASettings.cprofile_path:
+        _report(f"cProfile stats written to {GASettings.cprofile_path}", status_cb)
+    _report(f"Training complete. Best saved to {BEST_PATH}", status_cb)
+    return best
+
+
+def _report(msg, status_cb):
+    if status_cb:
+        status_cb(msg)
+    else:
+        print(msg)
+
+
+def generation_metrics(gen, results, seconds):
+    """Plain dict of one generation's numbers: best/mean score and win rate, diversity
+    (mean per-parameter std of the evaluated population's weights) and gens/sec."""
+    scores = np.array([r[2] for r in results])
+    wins = np.array([r[1] for r in results])
+    weights = np.stack([r[0].weights for r in results])
+    return {"generation": gen, "best_score": float(scores[0]), "mean_score": float(scores.mean()),
+            "win_rate": float(wins[0]), "mean_win_rate": float(wins.mean()),
+            "diversity": float(weights.std(axis=0).mean()),
+            "gens_per_sec": 1.0/seconds if seconds > 0 else 0.0}
+
+
+def _train_loop(pop_size, generations, status_cb, executor, writer=None, resume=False, progress_cb=None, trace=None):
+    if resume:
+        # every stream is derived from (seed, generation), so restoring the seed
+        # and the generation counter restores the RNG state too
+        state = check_layout(load_checkpoint(CHECKPOINT_PATH), 1, pop_size)
+        seed = state["seed"]
+        pop = Population(state["weights"], state["bias"])
+        start = state["generation"] + 1
+        history = [tuple(h) for h in state["history"]]
+        best = Agent(state["best_weights"], state["best_bias"])
+        _report(f"Resumed from {CHECKPOINT_PATH} at generation {start-1}", status_cb)
+    else:
+        # unseeded runs still get a concrete seed so their checkpoints can be resumed
+        seed = GASettings.seed if GASettings.seed is not None else np.random.SeedSequence().entropy
+        init_rng = stream(seed)
+        pop = [Agent(rng=init_rng) for _ in range(pop_size)]
+        start = 1
+        history = []
+        best = None
+    use_cache = GASettings.fitness_cache and GASettings.evaluator == "sample"
+    cache = FitnessCache(GASettings.cache_max_fights, GASettings.cache_ttl) if use_cache else None
+    for gen in range(start,generations+1):
+        started = time.perf_counter()
+        pop, results = evolve(pop, executor=executor, generation=gen, cache=cache, seed=seed)
         best_agent, best_win, best_score = results[0]
+        history.append((best_score, best_win))
         msg = f"Gen {gen}: best_score={best_score:.3f} win_rate={best_win:.3f}"
-        if status_cb:
-            status_cb(msg)
-        else:
-            print(msg)
+        if cache is not None:
+            msg += f" {cache.stats()}"
         best = best_agent
+        if writer and gen % GASettings.checkpoint_every == 0:
+            with PROFILER.phase("checkpoint"):
+                writer.submit(weights=pop.weights, bias=pop.bias,
+                              generation=gen, seed=seed, history=list(history),
+                              best_weights=best.weights.copy(), best_bias=best.bias.copy())
         # occasional save
         if gen%10==0:
-            with open(BEST_PATH, "wb") as f:
-                pickle.dump(best.get_params(), f)
+            with PROFILER.phase("save_best"):
+                with open(BEST_PATH, "wb") as f:
+                    pickle.dump(best.get_params(), f)
+        profile = PROFILER.collect() if PROFILER.enabled else None
+        if profile:
+            msg += f" | {summary(profile)}"
+        _report(msg, status_cb)
+        if progress_cb or trace:
+            metrics = generation_metrics(gen, results, time.perf_counter() - started)
+            if profile:
+                metrics["profile"] = profile
+            if progress_cb:
+                progress_cb(metrics)
+            if trace:
+                trace.write(metrics)
+    if best is None:
+        return None
     # final save
     with open(BEST_PATH, "wb") as f:
         pickle.dump(best.get_params(), f)
-    final_msg = f"Training complete. Best saved to {BEST_PATH}"
-    if status_cb:
-        status_cb(final_msg)
-    else:
-        print(final_msg)
     return best
 
 
@@ -1,16 +1,25 @@
 import tkinter as tk
-import pickle
-from fighter import Fighter, MAX_HP, Ability
-from abilities import power_strike, vampiric_bite, recharge, poison_strike, burn_blast, bleeding_slash, shield_wall
-import os, random
+from arena import Arena, make_fighters, GRID_SIZE
+from fighter import STATUS_NAMES
+from qtrain import load_tables, table_prefix
+from qstore import DeltaWriter
+from simloop import SimulationWorker, SPEEDS
 from agents import Agent
 from ga_train import load_best, train_and_save
+from progress import ProgressChannel
 import threading
+try:
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+except ImportError:     # the GUI still trains without it, just with no chart
+    Figure = None
 
-QTABLE_FILE = "ai_qtables.pkl"
-GRID_SIZE = 15
 TILE_SIZE = 40
-VISION_RANGE = 7
+FRAME_MS = 33               # renderer frame cap (~30 fps)
+ANIMATE_MAX_SPEED = 4       # skip action animations above this simulation speed
+PROGRESS_MS = 250           # how often training progress is drained into the GUI
+PROGRESS_MAX_ITEMS = 200    # progress items handled per drain
+MAX_LOG_LINES = 1000        # the log keeps only the newest lines
 
 class FightSimGUI:
     BAR_LENGTH = 200
@@ -18,9 +27,7 @@ class FightSimGUI:
     def __init__(self, root):
         self.root = root
         root.title("AI Fight Simulator")
-
-        # Load Q-tables
-        self.qtables = self.load_qtables()
+        root.protocol("WM_DELETE_WINDOW", self.close)
 
         # Logging area
         self.text = tk.Text(root, width=70, height=12, font=("Consolas",12))
@@ -39,119 +46,147 @@ class FightSimGUI:
         self.clear_ga_btn.pack(side=tk.LEFT, padx=6)
         self.train_ga_btn = tk.Button(btn_frame, text="Train GA (background)", command=self.start_training)
         self.train_ga_btn.pack(side=tk.LEFT, padx=6)
+        self.speed_btn = tk.Button(btn_frame, text="Speed: 1x", command=self.cycle_speed)
+        self.speed_btn.pack(side=tk.LEFT, padx=6)
 
-        # Win counters
-        self.ai1_wins = 0
-        self.ai2_wins = 0
+        # GA training progress (filled by start_training)
+        self.training = None
+        self.progress = None
+        self.history = []
+        self.chart = None
 
         # Fighters
-        self.ai1 = Fighter("AI_One")
-        self.ai2 = Fighter("AI_Two")
-        if "AI_One" in self.qtables:
-            self.ai1.q_table = self.qtables["AI_One"]
-        if "AI_Two" in self.qtables:
-            self.ai2.q_table = self.qtables["AI_Two"]
-
-        # Add abilities
-        self.ai1.add_ability(Ability("Power Strike",3,power_strike))
-        self.ai1.add_ability(Ability("Vampiric Bite",4,vampiric_bite))
-        self.ai1.add_ability(Ability("Recharge",5,recharge))
-        self.ai1.add_ability(Ability("Bleeding Slash",4,bleeding_slash))
-
-        self.ai2.add_ability(Ability("Poison Strike",3,poison_strike))
-        self.ai2.add_ability(Ability("Burn Blast",4,burn_blast))
-        self.ai2.add_ability(Ability("Shield Wall",5,shield_wall))
-
-        self.init_maze()
-        self.start_new_fight()
-        self.update_fight()
-
-    # ---------------- Maze ----------------
-    def init_maze(self):
-        # Empty maze
-        self.maze = [[0]*GRID_SIZE for _ in range(GRID_SIZE)]
-
-        # Border walls
-        for i in range(GRID_SIZE):
-            self.maze[0][i] = self.maze[GRID_SIZE-1][i] = 1
-            self.maze[i][0] = self.maze[i][GRID_SIZE-1] = 1
-
-        # Random walls inside the maze
-        wall_count = GRID_SIZE  # roughly GRID_SIZE random walls
-        placed = 0
-        while placed < wall_count:
-            x = random.randint(1, GRID_SIZE-2)
-            y = random.randint(1, GRID_SIZE-2)
-            # Don't block the surrounding area too much
-            if self.maze[y][x] == 0 and self.surrounding_free(x, y):
-                self.maze[y][x] = 1
-                placed += 1
-
-    def surrounding_free(self, x, y):
-        """Ensure at least one open path in all directions to prevent trapping."""
-        for dx, dy in [(-1,0),(1,0),(0,-1),(0,1)]:
-            nx, ny = x+dx, y+dy
-            if 0 <= nx < GRID_SIZE and 0 <= ny < GRID_SIZE:
-                if self.maze[ny][nx] == 0:
-                    return True
-        return False
-
-
-
-    def draw_maze(self):
-        self.canvas.delete("all")
-        for y,row in enumerate(self.maze):
+        self.ai1, self.ai2 = make_fighters()
+
+        # Load Q-tables (needs the abilities to know each fighter's actions)
+        self.qtables = self.load_qtables()
+        # changed Q-table rows are written by a background thread after each fight
+        self.qtable_writer = DeltaWriter()
+        self.ai1.q_table = self.qtables["AI_One"]
+        self.ai2.q_table = self.qtables["AI_Two"]
+
+        # maze, movement and fight rules (shared with the headless trainer)
+        self.arena = Arena(self.ai1, self.ai2)
+        self.maze = self.arena.maze
+        self.build_scene()
+
+        # the simulation runs on its own thread; the renderer draws its latest snapshot
+        self.sim = SimulationWorker(self.arena, on_fight_end=self.save_qtables)
+        self.sim.start()
+        self.render_frame()
+
+    # ---------------- Rendering ----------------
+    # Canvas items are created once and afterwards only moved or reconfigured when
+    # what they show has changed (self.drawn holds the last drawn state per item).
+    # The maze view and the zoomed fight view are two tagged sets of items, shown
+    # one at a time. Everything drawn comes from a simloop.Snapshot, never from the
+    # live fighters, which the simulation thread is changing.
+    def build_scene(self):
+        c = self.canvas
+        self.drawn = {}
+        self.view = None
+        self.tiles = [[c.create_rectangle(x*TILE_SIZE, y*TILE_SIZE, (x+1)*TILE_SIZE, (y+1)*TILE_SIZE, outline="white", tags="maze")
+                       for x in range(len(row))] for y, row in enumerate(self.arena.maze)]
+        self.refresh_tiles()
+        # fighter square plus one letter slot per status
+        self.fighter_items = {}
+        for f, color in [(self.ai1,"blue"),(self.ai2,"red")]:
+            rect = c.create_rectangle(0, 0, 0, 0, fill=color, tags="maze")
+            letters = [c.create_text(0, 0, text="", fill="yellow", font=("Arial",10,"bold"), tags="maze") for _ in STATUS_NAMES]
+            self.fighter_items[f.name] = (rect, letters)
+        self.hp_bars = {}
+        self.create_hp_bar(self.ai1, 20, GRID_SIZE*TILE_SIZE+10, "blue", "maze")
+        self.create_hp_bar(self.ai2, 300, GRID_SIZE*TILE_SIZE+10, "red", "maze")
+        self.win_texts = [c.create_text(x, GRID_SIZE*TILE_SIZE+50, fill="white", font=("Arial",12,"bold"), tags="maze") for x in (100, 400)]
+        # zoomed fight view
+        c.create_rectangle(50,50,250,250,fill="blue", tags="zoom")
+        c.create_rectangle(350,50,550,250,fill="red", tags="zoom")
+        self.create_hp_bar(self.ai1, 50, 20, "blue", "zoom")
+        self.create_hp_bar(self.ai2, 350, 20, "red", "zoom")
+        c.itemconfigure("zoom", state="hidden")
+
+    def create_hp_bar(self, fighter, x, y, color, view):
+        c = self.canvas
+        c.create_rectangle(x, y, x+self.BAR_LENGTH, y+15, fill="grey", tags=view)
+        bar = c.create_rectangle(x, y, x+self.BAR_LENGTH, y+15, fill=color, tags=view)
+        label = c.create_text(x+self.BAR_LENGTH/2, y+7, fill="white", font=("Arial",10,"bold"), tags=view)
+        self.hp_bars[fighter.name, view] = (bar, label, x, y)
+
+    def changed(self, key, state):
+        # True (and remember state) if the item at key shows something else
+        if self.drawn.get(key) == state:
+            return False
+        self.drawn[key] = state
+        return True
+
+    def show_view(self, view):
+        if self.view != view:
+            for other in ("maze", "zoom"):
+                self.canvas.itemconfigure(other, state="normal" if other == view else "hidden")
+            self.view = view
+
+    def refresh_tiles(self):
+        for y,row in enumerate(self.arena.maze):
             for x,cell in enumerate(row):
-                color = "grey" if cell else "black"
-                self.canvas.create_rectangle(x*TILE_SIZE, y*TILE_SIZE, (x+1)*TILE_SIZE, (y+1)*TILE_SIZE, fill=color, outline="white")
-        self.draw_fighter(self.ai1,"blue")
-        self.draw_fighter(self.ai2,"red")
-        self.draw_hp_bar(self.ai1, 20, GRID_SIZE*TILE_SIZE+10, "blue")
-        self.draw_hp_bar(self.ai2, 300, GRID_SIZE*TILE_SIZE+10, "red")
-        self.canvas.create_text(100, GRID_SIZE*TILE_SIZE+50, text=f"Wins: {self.ai1.name} {self.ai1_wins}", fill="white", font=("Arial",12,"bold"))
-        self.canvas.create_text(400, GRID_SIZE*TILE_SIZE+50, text=f"Wins: {self.ai2.name} {self.ai2_wins}", fill="white", font=("Arial",12,"bold"))
-
-    def draw_fighter(self,fighter,color):
+                if self.changed(("tile", x, y), cell):
+                    self.canvas.itemconfigure(self.tiles[y][x], fill="grey" if cell else "black")
+
+    def render_frame(self):
+        snap = self.sim.take()
+        if snap is not None:
+            for log in snap.logs: self.log(log)
+            if self.changed("maze_version", snap.maze_version):
+                self.refresh_tiles()
+            self.draw_maze(snap)
+            if snap.actions:
+                self.zoom_fight(snap)
+        self.root.after(FRAME_MS, self.render_frame)
+
+    def draw_maze(self, snap):
+        self.show_view("maze")
+        for view in snap.fighters:
+            self.draw_fighter(view)
+            self.draw_hp_bar(view, "maze")
+        if self.changed("wins", snap.wins):
+            for item, view, n in zip(self.win_texts, snap.fighters, snap.wins):
+                self.canvas.itemconfigure(item, text=f"Wins: {view.name} {n}")
+
+    def draw_fighter(self, fighter):
         x,y = fighter.pos
-        self.canvas.create_rectangle(x*TILE_SIZE+5, y*TILE_SIZE+5, (x+1)*TILE_SIZE-5, (y+1)*TILE_SIZE-5, fill=color)
-        offset = 0
-        for s in fighter.statuses:
-            if fighter.statuses[s]>0:
-                self.canvas.create_text(x*TILE_SIZE+20, y*TILE_SIZE+10+offset, text=s[0].upper(), fill="yellow", font=("Arial",10,"bold"))
-                offset += 12
-
-    def draw_hp_bar(self, fighter, x, y, color):
+        rect, letters = self.fighter_items[fighter.name]
+        if self.changed(("fighter", fighter.name), (x, y)):
+            self.canvas.coords(rect, x*TILE_SIZE+5, y*TILE_SIZE+5, (x+1)*TILE_SIZE-5, (y+1)*TILE_SIZE-5)
+        active = fighter.statuses
+        for i, item in enumerate(letters):
+            if i < len(active):
+                if self.changed(("letter", fighter.name, i), (x, y, active[i])):
+                    self.canvas.coords(item, x*TILE_SIZE+20, y*TILE_SIZE+10+12*i)
+                    self.canvas.itemconfigure(item, text=active[i][0].upper())
+            elif self.changed(("letter", fighter.name, i), None):
+                self.canvas.itemconfigure(item, text="")
+
+    def draw_hp_bar(self, fighter, view):
+        if not self.changed(("hp", fighter.name, view), (fighter.hp, fighter.max_hp)):
+            return
+        bar, label, x, y = self.hp_bars[fighter.name, view]
         frac = fighter.hp / fighter.max_hp
-        self.canvas.create_rectangle(x, y, x+self.BAR_LENGTH, y+15, fill="grey")
-        self.canvas.create_rectangle(x, y, x+self.BAR_LENGTH*frac, y+15, fill=color)
-        self.canvas.create_text(x+self.BAR_LENGTH/2, y+7, text=f"{fighter.hp}/{fighter.max_hp}", fill="white", font=("Arial",10,"bold"))
+        self.canvas.coords(bar, x, y, x+self.BAR_LENGTH*frac, y+15)
+        self.canvas.itemconfigure(label, text=f"{fighter.hp}/{fighter.max_hp}")
 
     # ---------------- Logging ----------------
     def log(self,msg):
         self.text.insert(tk.END,msg+"\n")
+        # drop the oldest lines so the widget stays small however long it runs
+        lines = int(self.text.index("end-1c").split(".")[0]) - 1
+        if lines > MAX_LOG_LINES:
+            self.text.delete("1.0", f"{lines-MAX_LOG_LINES+1}.0")
         self.text.see(tk.END)
 
-    # ---------------- Fight setup ----------------
-    def start_new_fight(self):
-        for f in [self.ai1,self.ai2]:
-            f.hp = MAX_HP
-            f.statuses.clear()
-            for a in f.abilities: a.cur_cd = 0
-            # reset attached agents' cooldowns if any
-            if hasattr(f, "agent") and f.agent is not None:
-                # nothing to reset inside Agent, but keep attribute
-                pass
-
-        while True:
-            x1,y1 = random.randint(1,GRID_SIZE-2), random.randint(1,GRID_SIZE-2)
-            x2,y2 = random.randint(1,GRID_SIZE-2), random.randint(1,GRID_SIZE-2)
-            if self.maze[y1][x1]==0 and self.maze[y2][x2]==0 and abs(x1-x2)+abs(y1-y2)>6:
-                self.ai1.pos = (x1,y1)
-                self.ai2.pos = (x2,y2)
-                break
-
-        self.log("\n===== NEW FIGHT =====\n")
-        self.draw_maze()
+    # ---------------- Simulation speed ----------------
+    def cycle_speed(self):
+        speed = SPEEDS[(SPEEDS.index(self.sim.speed) + 1) % len(SPEEDS)]
+        self.sim.set_speed(speed)
+        self.speed_btn.configure(text=f"Speed: {speed}x" if speed else "Speed: Max")
 
     def load_ga_agents(self):
         try:
@@ -169,122 +204,94 @@ class FightSimGUI:
         self.log("Loaded GA agent: attached best -> AI_One, random -> AI_Two")
 
     def start_training(self):
-        # run GA training in a background thread and stream progress to GUI
+        # run GA training in a background thread; it only writes to a ProgressChannel,
+        # which poll_progress drains on the Tk thread
+        if self.training is not None and self.training.is_alive():
+            self.log("GA training is already running.")
+            return
+        channel = ProgressChannel()
         def runner():
             # use default GA params
-            train_and_save(status_cb=self.log)
-        t = threading.Thread(target=runner, daemon=True)
-        t.start()
+            try:
+                train_and_save(status_cb=channel.message, progress_cb=channel.metrics)
+            except Exception as e:
+                channel.message(f"GA training failed: {e!r}")
+        self.progress = channel
+        self.history = []
+        self.build_chart()
+        self.training = threading.Thread(target=runner, daemon=True)
+        self.training.start()
+        self.train_ga_btn.configure(state=tk.DISABLED)
         self.log("Started GA training in background thread...")
+        self.root.after(PROGRESS_MS, self.poll_progress)
+
+    def poll_progress(self):
+        messages, metrics = self.progress.drain(PROGRESS_MAX_ITEMS)
+        for msg in messages:
+            self.log(msg)
+        if metrics:
+            self.history.extend(metrics)
+            self.draw_chart()
+        if self.training.is_alive() or messages or metrics:
+            self.root.after(PROGRESS_MS, self.poll_progress)
+        else:
+            self.train_ga_btn.configure(state=tk.NORMAL)
+
+    # ---------------- Training chart ----------------
+    def build_chart(self):
+        if self.chart is not None:
+            return
+        if Figure is None:
+            self.log("matplotlib not installed; no live training chart.")
+            return
+        fig = Figure(figsize=(6, 2.4), dpi=100)
+        score_ax = fig.add_subplot(1, 2, 1)
+        score_ax.set_title("score", fontsize=9)
+        win_ax = fig.add_subplot(1, 2, 2)
+        win_ax.set_title("win rate / diversity", fontsize=9)
+        lines = {"best_score": score_ax.plot([], [], label="best")[0],
+                 "mean_score": score_ax.plot([], [], label="mean")[0],
+                 "win_rate": win_ax.plot([], [], label="best win")[0],
+                 "diversity": win_ax.plot([], [], label="diversity")[0]}
+        for ax in (score_ax, win_ax):
+            ax.tick_params(labelsize=7)
+            ax.legend(fontsize=7, loc="upper left")
+        fig.tight_layout()
+        canvas = FigureCanvasTkAgg(fig, master=self.root)
+        canvas.get_tk_widget().pack(padx=10, pady=5)
+        self.chart = (canvas, (score_ax, win_ax), lines, fig.suptitle(""))
+
+    def draw_chart(self):
+        # one redraw per drain, however many generations arrived since the last
+        if self.chart is None:
+            return
+        canvas, axes, lines, title = self.chart
+        gens = [m["generation"] for m in self.history]
+        for key, line in lines.items():
+            line.set_data(gens, [m[key] for m in self.history])
+        for ax in axes:
+            ax.relim()
+            ax.autoscale_view()
+        title.set_text(f"gen {gens[-1]}  {self.history[-1]['gens_per_sec']:.2f} gen/s")
+        canvas.draw_idle()
 
     def clear_ga_agents(self):
         self.ai1.agent = None
         self.ai2.agent = None
         self.log("Cleared GA agents; using built-in Fighter AI (Q-learning / scripted).")
 
-    # ---------------- Fight update ----------------
-    def update_fight(self):
-        for f in [self.ai1,self.ai2]:
-            for log in f.tick_statuses(): self.log(log)
-            f.tick_cooldowns()
-
-        ax,ay = self.ai1.pos
-        bx,by = self.ai2.pos
-        dist = abs(ax-bx)+abs(ay-by)
-
-        visible1 = self.can_see(self.ai1,self.ai2)
-        visible2 = self.can_see(self.ai2,self.ai1)
-
-        # Sneak attack: crit first hit if only one sees the other
-        sneak_attacker = None
-        if visible1 != visible2:
-            sneak_attacker = self.ai1 if not visible1 else self.ai2
-            self.log(f"💥 {sneak_attacker.name} performs a sneak attack!")
-
-        # Movement
-        if dist>1 or not visible1: self.ai_move(self.ai1,self.ai2, visible1)
-        if dist>1 or not visible2: self.ai_move(self.ai2,self.ai1, visible2)
-
-        self.draw_maze()
-
-        if dist <= 1 and (visible1 or visible2):
-            self.zoom_fight(sneak_attacker)
-
-        # Check win
-        if self.ai1.hp<=0 or self.ai2.hp<=0:
-            winner = self.ai1.name if self.ai1.hp>0 else self.ai2.name
-            self.log(f"\n🏆 Winner: {winner}\n")
-            if winner==self.ai1.name: self.ai1_wins +=1
-            else: self.ai2_wins +=1
-            self.save_qtables()
-            self.root.after(1200,self.start_new_fight)
-            self.root.after(1300,self.update_fight)
-            return
-
-        self.root.after(300,self.update_fight)  # faster updates
-
-    # ---------------- Visibility ----------------
-    def can_see(self, ai, opp):
-        ax,ay = ai.pos
-        bx,by = opp.pos
-        return abs(ax-bx)+abs(ay-by) <= VISION_RANGE
-
-    # ---------------- AI movement with pathfinding ----------------
-    def ai_move(self, ai, opp, sees_opponent):
-        if ai.statuses.get("stunned",0)>0: return
-        steps_per_turn = 2
-        for _ in range(steps_per_turn):
-            path = self.find_path(ai.pos, opp.pos if sees_opponent else None)
-            if path and len(path)>1:
-                ai.pos = path[1]  # move next step along path
-            else:
-                # fallback random move
-                ax,ay = ai.pos
-                move_options = [(ax+dx, ay+dy) for dx,dy in [(0,-1),(0,1),(-1,0),(1,0)]
-                                if 0<=ax+dx<GRID_SIZE and 0<=ay+dy<GRID_SIZE and self.maze[ay+dy][ax+dx]==0]
-                if move_options:
-                    ai.pos = random.choice(move_options)
-
-    def find_path(self, start, goal):
-        # Simple BFS for pathfinding if goal exists
-        if goal is None: return None
-        queue = [(start, [start])]
-        visited = set()
-        while queue:
-            pos, path = queue.pop(0)
-            if pos==goal: return path
-            if pos in visited: continue
-            visited.add(pos)
-            x,y = pos
-            for dx,dy in [(0,-1),(0,1),(-1,0),(1,0)]:
-                nx,ny = x+dx,y+dy
-                if 0<=nx<GRID_SIZE and 0<=ny<GRID_SIZE and self.maze[ny][nx]==0:
-                    queue.append(((nx,ny), path+[(nx,ny)]))
-        return None
-
     # ---------------- Zoomed fight ----------------
-    def zoom_fight(self, sneak_attacker=None):
-        self.canvas.delete("all")
-        self.canvas.create_rectangle(50,50,250,250,fill="blue")
-        self.canvas.create_rectangle(350,50,550,250,fill="red")
-        self.draw_hp_bar(self.ai1, 50, 20, "blue")
-        self.draw_hp_bar(self.ai2, 350, 20, "red")
-
-        # Determine action order for sneak attack
-        if sneak_attacker==self.ai1:
-            order = [(self.ai1,self.ai2),(self.ai2,self.ai1)]
-        elif sneak_attacker==self.ai2:
-            order = [(self.ai2,self.ai1),(self.ai1,self.ai2)]
-        else:
-            order = [(self.ai1,self.ai2),(self.ai2,self.ai1)]
+    def zoom_fight(self, snap):
+        self.show_view("zoom")
+        ai1, ai2 = snap.fighters
+        self.draw_hp_bar(ai1, "zoom")
+        self.draw_hp_bar(ai2, "zoom")
 
-        for attacker, defender in order:
-            a = attacker.choose_action(defender)
-            log,r = attacker.perform_action(a, defender)
-            self.log(log)
-            self.animate_action(a, 50 if attacker==self.ai1 else 350, 50, defender)
-            ns = attacker.get_state_key(defender)
-            attacker.update_q(attacker.get_state_key(defender), a, r, ns)
+        if self.sim.speed is None or self.sim.speed > ANIMATE_MAX_SPEED:
+            return
+        for name, a in snap.actions:
+            defender = ai2 if name==ai1.name else ai1
+            self.animate_action(a, 50 if name==ai1.name else 350, 50, defender)
 
     # ---------------- Action animation ----------------
     def animate_action(self, action, x, y, target):
@@ -319,13 +326,24 @@ class FightSimGUI:
 
     # ---------------- Q-table persistence ----------------
     def save_qtables(self):
+        # runs on the simulation thread after each fight; returns lines for the log
         self.qtables["AI_One"] = self.ai1.q_table
         self.qtables["AI_Two"] = self.ai2.q_table
-        with open(QTABLE_FILE,"wb") as f:
-            pickle.dump(self.qtables,f)
+        lines = []
+        for name, table in self.qtables.items():
+            self.qtable_writer.submit(table_prefix(name), table)
+            lines.append(f"Q-table {name}: {table.stats()}")
+        error = self.qtable_writer.pop_error()
+        if error is not None:
+            lines.append(f"Q-table save failed (will retry): {error}")
+        return lines
 
     def load_qtables(self):
-        if os.path.exists(QTABLE_FILE):
-            with open(QTABLE_FILE,"rb") as f:
-                return pickle.load(f)
-        return {}
+        # memory-mapped array tables if present, else convert the legacy pickle
+        return load_tables([self.ai1, self.ai2])
+
+    def close(self):
+        # stop the simulation, then let the writer finish the queued deltas
+        self.sim.stop()
+        self.qtable_writer.close()
+        self.root.destroy()
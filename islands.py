@@ -0,0 +1,162 @@
+import pickle
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from agents import Agent, Population
+from checkpoint import CHECKPOINT_PATH, check_layout, load_checkpoint
+from profiling import PROFILER, merge_profiles, summary
+from seeding import stream
+from tournament import round_robin_pairs, fight_points
+from ga_train import GASettings, BEST_PATH, evolve, generation_metrics, play_matchups, _report
+
+# Island-model GA: GASettings.islands populations evolve independently, one worker
+# process each, with the usual evolve(). Every migration_interval generations the
+# islands hand back their arrays, the top `migrants` agents of each island replace
+# the newest children of the next island (a ring), and the island champions play
+# a small playoff to pick the overall best, which is saved to BEST_PATH.
+
+PLAYOFF_STREAM = 2      # spawn_key (generation, PLAYOFF_STREAM) under the master seed
+PLAYOFF_FIGHTS = 8      # fights per ordered pair of champions
+
+
+def island_seed(seed, island):
+    # SeedSequence entropy for one island's streams, distinct from the master seed's
+    return [seed, island]
+
+
+def _settings():
+    return {k: v for k, v in vars(GASettings).items() if not k.startswith("_")}
+
+
+def _island_task(task):
+    # runs in a pool worker: evolve one island from generation start to stop. The
+    # settings travel with the task so spawned workers see the caller's GASettings.
+    weights, bias, seed, start, stop, settings = task
+    for k, v in settings.items():
+        setattr(GASettings, k, v)
+    # the parent's PROFILER doesn't reach the workers; profile here and send it back
+    PROFILER.enabled = GASettings.profile
+    PROFILER.reset()
+    pop = Population(weights, bias)
+    metrics = []
+    for gen in range(start, stop+1):
+        started = time.perf_counter()
+        pop, results = evolve(pop, generation=gen, seed=seed)
+        metrics.append(generation_metrics(gen, results, time.perf_counter() - started))
+        if PROFILER.enabled:
+            metrics[-1]["profile"] = PROFILER.collect()
+    champion = results[0][0]
+    return pop.weights, pop.bias, champion.weights.copy(), champion.bias.copy(), metrics
+
+
+def migrate(pops, migrants):
+    """Ring migration in place: island i's first `migrants` rows (its elites, best
+    first) overwrite the last rows (fresh children) of island i+1."""
+    k = len(pops)
+    if k < 2 or migrants <= 0:
+        return
+    outgoing = [(w[:migrants].copy(), b[:migrants].copy()) for w, b in pops]
+    for i, (w, b) in enumerate(outgoing):
+        dest_w, dest_b = pops[(i+1) % k]
+        dest_w[-migrants:] = w
+        dest_b[-migrants:] = b
+
+
+def playoff(champ_w, champ_b, seed, generation):
+    """Index of the champion with the most points in a round robin of PLAYOFF_FIGHTS
+    fights per pair and side."""
+    k = len(champ_w)
+    if k == 1:
+        return 0
+    pop = Population(champ_w, champ_b)
+    i, j = round_robin_pairs(k)
+    idx_a = np.tile(np.concatenate([i, j]), PLAYOFF_FIGHTS)
+    idx_b = np.tile(np.concatenate([j, i]), PLAYOFF_FIGHTS)
+    winner, _ = play_matchups(pop, idx_a, idx_b, seq=np.random.SeedSequence(seed, spawn_key=(generation, PLAYOFF_STREAM)))
+    points = fight_points(winner)
+    totals = np.bincount(idx_a, points, k) + np.bincount(idx_b, 1.0 - points, k)
+    return int(np.argmax(totals))
+
+
+def merge_metrics(island_metrics, seconds):
+    """One metrics dict per generation over all islands: best score and its win rate
+    from the top island (ratings are only comparable within an island, so this is
+    indicative), means and diversity averaged, gens/sec of the whole epoch, and the
+    islands' profiles summed when they were collected."""
+    rate = len(island_metrics[0])/seconds if seconds > 0 else 0.0
+    merged = []
+    for per_gen in zip(*island_metrics):
+        top = max(range(len(per_gen)), key=lambda i: per_gen[i]["best_score"])
+        merged.append({"generation": per_gen[0]["generation"], "island": top,
+                       "best_score": per_gen[top]["best_score"], "win_rate": per_gen[top]["win_rate"],
+                       "mean_score": float(np.mean([m["mean_score"] for m in per_gen])),
+                       "mean_win_rate": float(np.mean([m["mean_win_rate"] for m in per_gen])),
+                       "diversity": float(np.mean([m["diversity"] for m in per_gen])),
+                       "gens_per_sec": rate})
+        if "profile" in per_gen[0]:
+            merged[-1]["profile"] = merge_profiles([m["profile"] for m in per_gen])
+    return merged
+
+
+def train_islands(pop_size, generations, status_cb, writer=None, resume=False, progress_cb=None, trace=None):
+    """The island-model counterpart of ga_train._train_loop; pop_size is per island."""
+    k = GASettings.islands
+    interval = max(1, GASettings.migration_interval)
+    if resume:
+        state = check_layout(load_checkpoint(CHECKPOINT_PATH), k, pop_size)
+        seed = state["seed"]
+        pops = list(zip(np.split(state["weights"], k), np.split(state["bias"], k)))
+        start = state["generation"] + 1
+        history = [tuple(h) for h in state["history"]]
+        best_w, best_b = state["best_weights"], state["best_bias"]
+        _report(f"Resumed {k} islands from {CHECKPOINT_PATH} at generation {start-1}", status_cb)
+    else:
+        seed = GASettings.seed if GASettings.seed is not None else np.random.SeedSequence().entropy
+        pops = []
+        for i in range(k):
+            p = Population.random(pop_size, rng=stream(island_seed(seed, i)))
+            pops.append((p.weights, p.bias))
+        start = 1
+        history = []
+        best_w = best_b = None
+    settings = _settings()
+    with ProcessPoolExecutor(max_workers=k) as executor:
+        while start <= generations:
+            # epochs end on multiples of the interval, so resumed runs migrate on the same generations
+            stop = min(generations, ((start-1)//interval + 1)*interval)
+            started = time.perf_counter()
+            tasks = [(w, b, island_seed(seed, i), start, stop, settings) for i, (w, b) in enumerate(pops)]
+            outcomes = list(executor.map(_island_task, tasks))
+            seconds = time.perf_counter() - started
+            pops = [(o[0], o[1]) for o in outcomes]
+            champ_w = np.stack([o[2] for o in outcomes])
+            champ_b = np.stack([o[3] for o in outcomes])
+            best = playoff(champ_w, champ_b, seed, stop)
+            best_w, best_b = champ_w[best], champ_b[best]
+            migrate(pops, min(GASettings.migrants, pop_size))
+            merged = merge_metrics([o[4] for o in outcomes], seconds)
+            if PROFILER.enabled:
+                # the playoff runs here, so it counts toward the epoch's last generation
+                merged[-1]["profile"] = merge_profiles([merged[-1]["profile"], PROFILER.collect()])
+            for metrics in merged:
+                history.append((metrics["best_score"], metrics["win_rate"]))
+                msg = (f"Gen {metrics['generation']}: best_score={metrics['best_score']:.3f} "
+                       f"win_rate={metrics['win_rate']:.3f} island={metrics['island']}")
+                if "profile" in metrics:
+                    msg += f" | {summary(metrics['profile'])}"
+                _report(msg, status_cb)
+                if progress_cb:
+                    progress_cb(metrics)
+                if trace:
+                    trace.write(metrics)
+            _report(f"Migration after gen {stop}: overall best from island {best}", status_cb)
+            if writer:
+                writer.submit(weights=np.concatenate([w for w, _ in pops]), bias=np.concatenate([b for _, b in pops]),
+                              generation=stop, seed=seed, history=list(history),
+                              best_weights=best_w.copy(), best_bias=best_b.copy(), islands=k)
+            with open(BEST_PATH, "wb") as f:
+                pickle.dump((best_w, best_b), f)
+            start = stop + 1
+    if best_w is None:
+        return None
+    return Agent(best_w, best_b)
@@ -1,10 +1,10 @@
+import os
 import sys
 
-from ga_train import train_and_save, load_best
-from battle import simulate_fight
+from ga_train import GASettings, train_and_save, load_best
+from checkpoint import CHECKPOINT_PATH, check_layout, load_checkpoint
+from battle import simulate_fight, render_events, LOG_EVENTS
 from agents import Agent
-from gui import FightSimGUI
-import tkinter as tk
 
 
 def demo():
@@ -14,29 +14,97 @@ def demo():
         print("No saved best agent found. Train first with `python main.py train`.")
         return
     rand_agent = Agent()
-    winner, a_hp, b_hp, logs = simulate_fight(best, rand_agent)
+    winner, a_hp, b_hp, events = simulate_fight(best, rand_agent, log_mode=LOG_EVENTS)
     print("Demo fight between best (A) and random (B):")
-    for line in logs[:50]:
+    # only the shown lines get rendered
+    for line in render_events(events[:50]):
         print(line)
     print("Result:", winner, "A_hp", a_hp, "B_hp", b_hp)
 
 
+def gui():
+    # Tk is only needed here, so the headless commands run without it
+    import tkinter as tk
+    from gui import FightSimGUI
+    root = tk.Tk()
+    FightSimGUI(root)
+    root.mainloop()
+
+
+def qtrain(args):
+    from qtrain import train_qtables, QTrainSettings
+    episodes = int(args[0]) if args and args[0].isdigit() else QTrainSettings.episodes
+    workers = None
+    if "--workers" in args:
+        workers = int(args[args.index("--workers") + 1])
+    train_qtables(episodes, workers=workers)
+
+
+def bench(args):
+    import bench as b
+    if "--quick" in args:
+        b.BenchSettings.scale = 0.1
+        b.BenchSettings.repeats = 3
+    names = args[args.index("--only") + 1].split(",") if "--only" in args else None
+    baseline_path = args[args.index("--baseline") + 1] if "--baseline" in args else b.BASELINE_FILE
+    report = b.run_benchmarks(names)
+    b.save_report(report, b.BENCH_FILE)
+    print(f"Results written to {b.BENCH_FILE}")
+    if "--save-baseline" in args:
+        b.save_report(report, baseline_path)
+        print(f"Baseline saved to {baseline_path}")
+        return
+    if not os.path.exists(baseline_path):
+        print(f"No baseline at {baseline_path}; save one with `python main.py bench --save-baseline`.")
+        return
+    baseline = b.load_report(baseline_path)
+    lines, regressions = b.compare(report, baseline)
+    print(f"Compared with {baseline_path}:")
+    if baseline["meta"]["scale"] != report["meta"]["scale"]:
+        print("(note: the baseline was run at a different --quick scale)")
+    for line in lines:
+        print(line)
+    if regressions:
+        print("Regressions:", ", ".join(regressions))
+        sys.exit(1)
+
+
 def main():
     if len(sys.argv) < 2:
         # default: launch GUI
-        root = tk.Tk()
-        FightSimGUI(root)
-        root.mainloop()
+        gui()
         return
     cmd = sys.argv[1]
     if cmd == "train":
-        train_and_save()
+        args = sys.argv[2:]
+        GASettings.profile = "--profile" in args
+        if "--islands" in args:
+            GASettings.islands = int(args[args.index("--islands") + 1])
+        if "--trace" in args:
+            GASettings.trace_path = args[args.index("--trace") + 1]
+        if "--cprofile" in args:
+            GASettings.cprofile_path = args[args.index("--cprofile") + 1]
+        resume = "--resume" in args
+        # only a missing checkpoint gets the friendly message; other missing paths raise as usual
+        if resume and not os.path.exists(CHECKPOINT_PATH):
+            print("No checkpoint found to resume from. Start with `python main.py train`.")
+            return
+        if resume:
+            # a checkpoint whose islands/population don't match this run is refused up front
+            try:
+                check_layout(load_checkpoint(CHECKPOINT_PATH), GASettings.islands, GASettings.population)
+            except ValueError as e:
+                print(f"Cannot resume: {e}")
+                return
+        train_and_save(resume=resume)
     elif cmd == "demo":
         demo()
+    elif cmd == "qtrain":
+        qtrain(sys.argv[2:])
+    elif cmd == "bench":
+        bench(sys.argv[2:])
     elif cmd == "gui":
-        root = tk.Tk()
-        FightSimGUI(root)
-        root.mainloop()
+        gui()
     else:
         print("Unknown command:", cmd)
 
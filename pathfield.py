@@ -0,0 +1,96 @@
+from collections import deque
+
+# Shortest-path lookups on a static grid maze (0 = open, 1 = wall). For each goal
+# cell one BFS fills a next-hop field: for every open cell, the neighbour to step
+# to. Fields are built once (all of them up front for small mazes, else on first
+# use) and reused until invalidate(), so a movement query is one list lookup.
+
+# neighbour order; ties between equally short paths go to the earliest direction,
+# the same path the old per-query BFS returned
+DIRECTIONS = [(0,-1),(0,1),(-1,0),(1,0)]
+PRECOMPUTE_CELLS = 4096     # build every field up front when the maze has at most this many open cells
+
+
+class PathField:
+    def __init__(self, maze, precompute=None):
+        self.maze = maze
+        self.invalidate()
+        if precompute is None:
+            precompute = len(self.open_cells) <= PRECOMPUTE_CELLS
+        if precompute:
+            for goal in self.open_cells:
+                self._field(goal)
+
+    def invalidate(self):
+        """Forget all fields; call after changing the maze."""
+        self.height = len(self.maze)
+        self.width = len(self.maze[0]) if self.maze else 0
+        self.open_cells = [y*self.width + x for y, row in enumerate(self.maze) for x, cell in enumerate(row) if cell == 0]
+        self.positions = [(i % self.width, i // self.width) for i in range(self.width*self.height)]
+        self.neighbours = {}
+        for i in self.open_cells:
+            x, y = self.positions[i]
+            self.neighbours[i] = [(y+dy)*self.width + x+dx for dx, dy in DIRECTIONS
+                                  if 0 <= x+dx < self.width and 0 <= y+dy < self.height and self.maze[y+dy][x+dx] == 0]
+        self.fields = {}
+        self.distances = {}
+
+    def _field(self, goal):
+        # BFS out from goal, then each cell's next hop is its first neighbour one step closer
+        dist = {goal: 0}
+        queue = deque([goal])
+        while queue:
+            cell = queue.popleft()
+            d = dist[cell] + 1
+            for n in self.neighbours[cell]:
+                if n not in dist:
+                    dist[n] = d
+                    queue.append(n)
+        nxt = [-1]*(self.width*self.height)
+        for cell, d in dist.items():
+            if d:
+                for n in self.neighbours[cell]:
+                    if dist.get(n) == d - 1:
+                        nxt[cell] = n
+                        break
+        self.fields[goal] = nxt
+        self.distances[goal] = dist
+        return nxt
+
+    def _index(self, pos):
+        x, y = pos
+        if 0 <= x < self.width and 0 <= y < self.height and self.maze[y][x] == 0:
+            return y*self.width + x
+        return None
+
+    def next_step(self, start, goal):
+        """Next position on a shortest path from start to goal, or None if start is
+        the goal or the goal can't be reached."""
+        g = self._index(goal)
+        s = self._index(start)
+        if g is None or s is None:
+            return None
+        field = self.fields.get(g)
+        if field is None:
+            field = self._field(g)
+        n = field[s]
+        return self.positions[n] if n >= 0 else None
+
+    def distance(self, start, goal):
+        """Steps on a shortest path, or None if unreachable."""
+        g = self._index(goal)
+        s = self._index(start)
+        if g is None or s is None:
+            return None
+        if g not in self.distances:
+            self._field(g)
+        return self.distances[g].get(s)
+
+    def path(self, start, goal):
+        """Full shortest path [start, ..., goal], or None if unreachable."""
+        if self.distance(start, goal) is None:
+            return None
+        path = [start]
+        while path[-1] != goal:
+            path.append(self.next_step(path[-1], goal))
+        return path
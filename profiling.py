@@ -0,0 +1,120 @@
+import cProfile
+import json
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+
+# Opt-in instrumentation for GA training: wall time per phase and event counters
+# (fights, turns, policy decisions), collected once per generation. While disabled,
+# phase() hands back a shared no-op context and count() returns at once, so the
+# hooks can stay in the code paths permanently.
+
+_NULL = nullcontext()
+
+
+class _Phase:
+    __slots__ = ("profiler", "name", "started")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.profiler.times[self.name] += time.perf_counter() - self.started
+
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.reset()
+
+    def reset(self):
+        self.times = defaultdict(float)
+        self.counts = defaultdict(int)
+
+    def phase(self, name):
+        """Context manager adding the time spent inside to phase `name`."""
+        return _Phase(self, name) if self.enabled else _NULL
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counts[name] += n
+
+    def collect(self):
+        """{"phases": seconds per phase, "counts": counters} accumulated since the
+        last collect(), plus turns_per_fight when fights were counted; then reset."""
+        counts = dict(self.counts)
+        if counts.get("fights"):
+            counts["turns_per_fight"] = counts.get("turns", 0) / counts["fights"]
+        out = {"phases": dict(self.times), "counts": counts}
+        self.reset()
+        return out
+
+
+def merge_profiles(profiles):
+    """Sum several collect() results (e.g. one per island worker) into one; phase
+    times add up across processes, so they are CPU seconds rather than wall time."""
+    phases, counts = defaultdict(float), defaultdict(int)
+    for profile in profiles:
+        for k, v in profile["phases"].items():
+            phases[k] += v
+        for k, v in profile["counts"].items():
+            if k != "turns_per_fight":
+                counts[k] += v
+    counts = dict(counts)
+    if counts.get("fights"):
+        counts["turns_per_fight"] = counts.get("turns", 0) / counts["fights"]
+    return {"phases": dict(phases), "counts": counts}
+
+
+# the instance the trainer, battle and agents code report to
+PROFILER = Profiler()
+
+
+def summary(profile):
+    """One-line text form of a collect() result for status_cb."""
+    phases = " ".join(f"{k}={v*1000:.1f}ms" for k, v in sorted(profile["phases"].items(), key=lambda kv: -kv[1]))
+    counts = profile["counts"]
+    parts = [phases]
+    if counts.get("fights"):
+        parts.append(f"fights={counts['fights']} turns/fight={counts['turns_per_fight']:.1f} "
+                     f"decisions={counts.get('decisions', 0)}")
+    if counts.get("solves"):
+        parts.append(f"solves={counts['solves']}")
+    return " ".join(p for p in parts if p)
+
+
+class TraceWriter:
+    """Appends one JSON object per line (per generation) to path."""
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "a")
+
+    def write(self, record):
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class CProfileHook:
+    """Runs cProfile around a block and dumps the stats to path (load them with pstats
+    or snakeviz). A no-op when path is None."""
+    def __init__(self, path=None):
+        self.path = path
+        self._profile = None
+
+    def __enter__(self):
+        if self.path:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        return self
+
+    def __exit__(self, *exc):
+        if self._profile is not None:
+            self._profile.disable()
+            self._profile.dump_stats(self.path)
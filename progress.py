@@ -0,0 +1,30 @@
+import queue
+
+# Thread-safe channel from a training thread to the GUI. The trainer puts log
+# messages and per-generation metric dicts; the Tk thread drains them on a timer,
+# so no widget is ever touched from the training thread.
+
+
+class ProgressChannel:
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+
+    def message(self, msg):
+        """status_cb for train_and_save."""
+        self._queue.put(("message", msg))
+
+    def metrics(self, metrics):
+        """progress_cb for train_and_save: one dict per generation."""
+        self._queue.put(("metrics", dict(metrics)))
+
+    def drain(self, limit=None):
+        """(messages, metrics) put since the last drain, oldest first; at most
+        limit items are taken so one call can't stall the caller."""
+        messages, metrics = [], []
+        while limit is None or len(messages) + len(metrics) < limit:
+            try:
+                kind, item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            (messages if kind == "message" else metrics).append(item)
+        return messages, metrics
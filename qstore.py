@@ -0,0 +1,135 @@
+import os
+import threading
+import numpy as np
+from qtable import ArrayQTable, append_log, read_log, write_snapshot
+
+# Background persistence for the GUI's Q-tables. After each fight the UI thread
+# only copies out the rows that changed (ArrayQTable.delta); a worker thread
+# appends them to the table's delta log and folds the log into a new snapshot
+# once it has grown large relative to the snapshot. The on-disk table is never
+# trimmed: the live table may still hold any row, and its dirty flags were
+# cleared when the row was logged, so the cap is applied when loading instead.
+
+
+def snapshot_bytes(prefix):
+    saved = ArrayQTable._snapshot(prefix)
+    if saved is None:
+        return 0
+    return sum(os.path.getsize(p) for p in saved[2].values() if os.path.exists(p))
+
+
+def compact(prefix):
+    """Replay the delta log into the snapshot and write the result as a new snapshot."""
+    ArrayQTable.load(prefix, mmap=False).save(prefix)
+
+
+def merge_deltas(old, new):
+    """One (codes, q, present, visits) delta holding both; new wins for codes in both."""
+    codes, q, present, visits = (np.concatenate([a, b]) for a, b in zip(old, new))
+    # first occurrence in reverse order = the newest row for each code
+    _, last = np.unique(codes[::-1], return_index=True)
+    keep = np.sort(len(codes) - 1 - last)
+    return codes[keep], q[keep], present[keep], visits[keep]
+
+
+class DeltaWriter:
+    """submit(prefix, table) hands the table's changed rows to a worker thread, which
+    appends them to <prefix>.log and compacts once the log is bigger than
+    compact_ratio times the snapshot (and at least min_compact_bytes). While a write
+    is running, further deltas for the same prefix are merged into one pending
+    delta, so a slow disk costs at most one table's worth of memory per prefix.
+    A failed write doesn't stop the worker: the error is kept for flush() (or
+    pop_error()) and the rows are retried with the prefix's next submit."""
+    def __init__(self, compact_ratio=0.5, min_compact_bytes=1 << 20):
+        self.compact_ratio = compact_ratio
+        self.min_compact_bytes = min_compact_bytes
+        self.appends = 0
+        self.compactions = 0
+        self._checked = set()
+        self._pending = {}      # prefix -> (actions, delta), oldest submit first
+        self._failed = {}       # prefix -> (actions, delta) of a write that raised
+        self._writing = False
+        self._error = None
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, prefix, table):
+        delta = table.delta()
+        with self._cond:
+            failed = self._failed.pop(prefix, None)
+            if failed is not None:
+                delta = merge_deltas(failed[1], delta)
+            if not len(delta[0]):
+                return
+            pending = self._pending.get(prefix)
+            if pending is not None:
+                delta = merge_deltas(pending[1], delta)
+            self._pending[prefix] = (list(table.actions), delta)
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                prefix = next(iter(self._pending))
+                actions, delta = self._pending.pop(prefix)
+                self._writing = True
+            try:
+                self._write(prefix, actions, delta)
+            except Exception as e:
+                with self._cond:
+                    self._error = e
+                    self._failed[prefix] = (actions, delta)
+                    # recheck the log for a torn record before the next append
+                    self._checked.discard(prefix)
+            finally:
+                with self._cond:
+                    self._writing = False
+                    self._cond.notify_all()
+
+    def _write(self, prefix, actions, delta):
+        log = prefix + ".log"
+        if prefix not in self._checked:
+            if not ArrayQTable.exists(prefix):
+                n = len(actions)
+                write_snapshot(prefix, actions, np.empty(0, dtype=np.int64), np.zeros((0, n)),
+                               np.zeros((0, n), dtype=bool), np.zeros(0, dtype=np.int64))
+            # cut off a record torn by a crash so new records stay readable
+            end = read_log(log)[1]
+            if os.path.exists(log) and os.path.getsize(log) != end:
+                with open(log, "r+b") as f:
+                    f.truncate(end)
+            self._checked.add(prefix)
+        append_log(log, delta)
+        self.appends += 1
+        if os.path.getsize(log) > max(self.min_compact_bytes, self.compact_ratio*snapshot_bytes(prefix)):
+            compact(prefix)
+            self.compactions += 1
+
+    def pop_error(self):
+        """The last write error since the previous call (None if there was none)."""
+        with self._cond:
+            error, self._error = self._error, None
+        return error
+
+    def flush(self):
+        """Block until everything submitted so far has been written; re-raises the
+        last write error, if any."""
+        with self._cond:
+            while self._pending or self._writing:
+                self._cond.wait()
+        error = self.pop_error()
+        if error is not None:
+            raise error
+
+    def close(self):
+        """Write what is pending and stop the thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
@@ -0,0 +1,535 @@
+import glob
+import json
+import os
+import numpy as np
+from checkpoint import fsync_dir
+
+# Array-backed Q-table for Fighter. States from Fighter.get_state_key are packed into
+# one int64 code; Q-values live in a (states x actions) float array.
+# A saved table is memory-mapped on load (sorted codes + values), and states seen
+# after loading go into a growable in-memory overlay, so load time doesn't depend
+# on table size. With max_states set, trim() evicts the coldest states (fewest
+# visits, or least recently used) whenever the table outgrows the cap.
+#
+# On disk a table is a numbered snapshot (<prefix>.<n>.codes/q/present/visits.npy,
+# named by the <prefix>.json manifest) plus an append-only log of changed states
+# (<prefix>.log) that load() replays on top. Saves and compaction write a new
+# snapshot and swap the manifest atomically, so a crash leaves the old one intact.
+
+MOODS = ("balanced", "aggressive", "defensive", "scared")
+MAX_ABILITIES = 4
+COMBO_LEN = 3
+
+
+EVICT_POLICIES = ("visits", "lru")
+
+
+class ArrayQTable:
+    def __init__(self, actions, capacity=1024, max_states=None, policy="visits", trim_to=0.9):
+        if policy not in EVICT_POLICIES:
+            raise ValueError(f"unknown eviction policy {policy!r}, expected one of {EVICT_POLICIES}")
+        self.actions = list(actions)
+        self.action_index = {a: i for i, a in enumerate(self.actions)}
+        n = len(self.actions)
+        # loaded part: sorted codes, possibly memory-mapped (copy-on-write)
+        self.base_codes = np.empty(0, dtype=np.int64)
+        self.base_q = np.zeros((0, n))
+        self.base_present = np.zeros((0, n), dtype=bool)
+        self.base_visits = np.zeros(0, dtype=np.int64)
+        self.base_used = np.zeros(0, dtype=np.int64)
+        self.base_new_visits = np.zeros(0, dtype=np.int64)   # visits since load/save, see changes()
+        self.base_dirty = np.zeros(0, dtype=bool)     # changed since the last delta()/save()
+        # states added since load: code -> overlay row
+        self._reset_overlay(capacity)
+        self._masks = {}
+        # memory cap: trim() keeps the trim_to * max_states hottest states once over it
+        self.max_states = max_states
+        self.policy = policy
+        self.trim_to = trim_to
+        self.clock = 0          # lookups so far; last-use stamp for the lru policy
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _reset_overlay(self, capacity=1024):
+        n = len(self.actions)
+        self.index = {}
+        self.q = np.zeros((capacity, n))
+        self.present = np.zeros((capacity, n), dtype=bool)
+        self.visits = np.zeros(capacity, dtype=np.int64)
+        self.used = np.zeros(capacity, dtype=np.int64)
+        self.new_visits = np.zeros(capacity, dtype=np.int64)
+        self.dirty = np.zeros(capacity, dtype=bool)
+
+    def __len__(self):
+        return len(self.base_codes) + len(self.index)
+
+    def __contains__(self, state):
+        return self.find(state) >= 0
+
+    # ---------------- State encoding ----------------
+    def encode(self, state):
+        """Pack a Fighter.get_state_key tuple into one int64 (fixed-width mixed radix).
+        Ints are taken as already-encoded (Fighter.state_code)."""
+        if isinstance(state, int):
+            return state
+        hp_self, hp_opp, my_cds, opp_cds, statuses, opp_statuses, mood, opp_mood, combo = state
+        if len(my_cds) > MAX_ABILITIES or len(opp_cds) > MAX_ABILITIES:
+            raise ValueError(f"state encoding supports at most {MAX_ABILITIES} abilities")
+        code = hp_self // 10 * 11 + hp_opp // 10
+        for cds in (my_cds, opp_cds):
+            # 4 values per slot: cooldown 0-2, or 3 = no ability in this slot
+            for i in range(MAX_ABILITIES):
+                code = code*4 + (cds[i] if i < len(cds) else 3)
+        for flags in (statuses, opp_statuses):
+            for f in flags:
+                code = code*2 + f
+        code = code*4 + MOODS.index(mood)
+        code = code*4 + MOODS.index(opp_mood)
+        # combo slots: 0 = empty, 1..n = action, n+1 = unknown action
+        radix = len(self.actions) + 2
+        combo = tuple(combo)[-COMBO_LEN:]
+        for i in range(COMBO_LEN):
+            if i < len(combo):
+                code = code*radix + self.action_index.get(combo[i], radix - 2) + 1
+            else:
+                code = code*radix
+        return code
+
+    # ---------------- Rows ----------------
+    def find_code(self, code):
+        """Row for code, or -1. Rows below len(base_codes) are loaded rows.
+        Counts as a visit (and a hit or miss in stats())."""
+        row = self._lookup(code)
+        if row >= 0:
+            self.hits += 1
+            self._touch(row)
+        else:
+            self.misses += 1
+        return row
+
+    def _lookup(self, code):
+        row = self.index.get(code)
+        if row is not None:
+            return row
+        i = int(np.searchsorted(self.base_codes, code))
+        if i < len(self.base_codes) and self.base_codes[i] == code:
+            return i
+        return -1
+
+    def _touch(self, row):
+        self.clock += 1
+        nb = len(self.base_codes)
+        if row < nb:
+            self.base_visits[row] += 1
+            self.base_new_visits[row] += 1
+            self.base_used[row] = self.clock
+        else:
+            self.visits[row - nb] += 1
+            self.new_visits[row - nb] += 1
+            self.used[row - nb] = self.clock
+
+    def find(self, state):
+        return self.find_code(self.encode(state))
+
+    def add_code(self, code, actions=()):
+        """Row for code, creating it with the given actions marked present."""
+        row = self._lookup(code)
+        if row < 0:
+            row = self._new_row(code, self.mask(actions))
+        self._touch(row)
+        return row
+
+    def _new_row(self, code, mask):
+        j = len(self.index)
+        if j == len(self.q):
+            self.q = np.concatenate([self.q, np.zeros_like(self.q)])
+            self.present = np.concatenate([self.present, np.zeros_like(self.present)])
+            self.visits = np.concatenate([self.visits, np.zeros_like(self.visits)])
+            self.used = np.concatenate([self.used, np.zeros_like(self.used)])
+            self.new_visits = np.concatenate([self.new_visits, np.zeros_like(self.new_visits)])
+            self.dirty = np.concatenate([self.dirty, np.zeros_like(self.dirty)])
+        self.present[j] = mask
+        self.dirty[j] = True
+        row = len(self.base_codes) + j
+        self.index[code] = row
+        return row
+
+    def add_codes(self, codes, masks):
+        """Vectorised add_code: rows for an array of codes, new states created with
+        the matching row of masks (bool, codes x actions) marked present."""
+        codes = np.asarray(codes, dtype=np.int64)
+        rows = np.full(len(codes), -1, dtype=np.int64)
+        nb = len(self.base_codes)
+        if nb:
+            i = np.minimum(np.searchsorted(self.base_codes, codes), nb - 1)
+            hit = self.base_codes[i] == codes
+            rows[hit] = i[hit]
+        get = self.index.get
+        for j in np.flatnonzero(rows < 0).tolist():
+            code = int(codes[j])
+            row = get(code)
+            rows[j] = self._new_row(code, masks[j]) if row is None else row
+        # one visit per occurrence, all stamped with this batch's clock
+        self.clock += 1
+        base = rows < nb
+        np.add.at(self.base_visits, rows[base], 1)
+        np.add.at(self.base_new_visits, rows[base], 1)
+        self.base_used[rows[base]] = self.clock
+        np.add.at(self.visits, rows[~base] - nb, 1)
+        np.add.at(self.new_visits, rows[~base] - nb, 1)
+        self.used[rows[~base] - nb] = self.clock
+        return rows
+
+    def add(self, state, actions=()):
+        return self.add_code(self.encode(state), actions)
+
+    def _slot(self, row):
+        nb = len(self.base_codes)
+        if row < nb:
+            return self.base_q, self.base_present, row
+        return self.q, self.present, row - nb
+
+    def _mark(self, rows):
+        rows = np.asarray(rows)
+        nb = len(self.base_codes)
+        self.base_dirty[rows[rows < nb]] = True
+        self.dirty[rows[rows >= nb] - nb] = True
+
+    def values(self, row):
+        q, _, i = self._slot(row)
+        return q[i]
+
+    def present_mask(self, row):
+        _, present, i = self._slot(row)
+        return present[i]
+
+    def mask(self, actions):
+        """Bool mask over self.actions; cached per distinct action list."""
+        key = tuple(actions)
+        m = self._masks.get(key)
+        if m is None:
+            m = np.zeros(len(self.actions), dtype=bool)
+            for a in key:
+                if a in self.action_index:
+                    m[self.action_index[a]] = True
+            self._masks[key] = m
+        return m
+
+    def get(self, row, action):
+        q, _, i = self._slot(row)
+        return q[i, self.action_index[action]]
+
+    def set(self, row, action, value):
+        q, present, i = self._slot(row)
+        a = self.action_index[action]
+        q[i, a] = value
+        present[i, a] = True
+        if present is self.base_present:
+            self.base_dirty[i] = True
+        else:
+            self.dirty[i] = True
+
+    def max_q(self, row):
+        """Max over the row's present actions (0.0 if none), like max(dict.values())."""
+        q, present, i = self._slot(row)
+        p = present[i]
+        return float(q[i][p].max()) if p.any() else 0.0
+
+    def best(self, row, mask, bias=0.0):
+        """Highest-scoring action among mask for row; missing entries count as 0.0."""
+        scores = np.where(mask, self.values(row) + bias, -np.inf)
+        return self.actions[int(np.argmax(scores))]
+
+    # ---------------- Batched updates ----------------
+    def gather(self, rows, actions):
+        """Q-values at (rows[i], actions[i]); actions are column indices."""
+        rows = np.asarray(rows)
+        out = np.empty(len(rows))
+        nb = len(self.base_codes)
+        base = rows < nb
+        out[base] = self.base_q[rows[base], actions[base]]
+        out[~base] = self.q[rows[~base] - nb, actions[~base]]
+        return out
+
+    def max_q_rows(self, rows):
+        """max_q for an array of rows."""
+        rows = np.asarray(rows)
+        nb = len(self.base_codes)
+        base = rows < nb
+        q = np.empty((len(rows), len(self.actions)))
+        present = np.empty(q.shape, dtype=bool)
+        q[base], present[base] = self.base_q[rows[base]], self.base_present[rows[base]]
+        q[~base], present[~base] = self.q[rows[~base] - nb], self.present[rows[~base] - nb]
+        best = np.where(present, q, -np.inf).max(axis=1)
+        return np.where(present.any(axis=1), best, 0.0)
+
+    def td_update(self, rows, actions, rewards, next_rows, lr, discount):
+        """Q-learning step for a batch of transitions (rows, action indices, rewards,
+        next rows); lr and discount may be scalars or per-transition arrays.
+        Targets use the values from before the batch and updates that hit the same
+        (row, action) are summed (scatter-add), so N environments' transitions are
+        applied together as N updates from a common starting point."""
+        rows = np.asarray(rows)
+        actions = np.asarray(actions)
+        current = self.gather(rows, actions)
+        target = np.asarray(rewards) + discount*self.max_q_rows(next_rows)
+        delta = lr*(target - current)
+        nb = len(self.base_codes)
+        base = rows < nb
+        np.add.at(self.base_q, (rows[base], actions[base]), delta[base])
+        self.base_present[rows[base], actions[base]] = True
+        over = rows[~base] - nb
+        np.add.at(self.q, (over, actions[~base]), delta[~base])
+        self.present[over, actions[~base]] = True
+        self._mark(rows)
+
+    # ---------------- Memory cap ----------------
+    def trim(self):
+        """Evict cold states if the table holds more than max_states, keeping the
+        trim_to * max_states with the most visits (ties go to the most recently
+        used) or, with policy "lru", the most recently used. Row ids change, so
+        call it between updates. Returns the number of evicted states."""
+        if self.max_states is None or len(self) <= self.max_states:
+            return 0
+        codes, q, present, visits, used, dirty, new_visits = self._merged("visits", "used", "dirty", "new_visits")
+        keep_n = int(self.max_states * self.trim_to)
+        order = np.lexsort((used, visits)) if self.policy == "visits" else np.argsort(used, kind="stable")
+        keep = np.sort(order[len(order) - keep_n:])
+        self._set_base(codes[keep], q[keep], present[keep], visits[keep], used[keep], dirty[keep], new_visits[keep])
+        self._reset_overlay()
+        evicted = len(codes) - keep_n
+        self.evictions += evicted
+        return evicted
+
+    def stats(self):
+        looked = self.hits + self.misses
+        rate = self.hits / looked if looked else 0.0
+        return (f"states={len(self)} hits={self.hits} misses={self.misses} "
+                f"hit_rate={rate:.1%} evictions={self.evictions}")
+
+    # ---------------- Conversion ----------------
+    def _merged(self, *extra):
+        """codes, q, present (plus the named per-state columns: visits, used, dirty, new_visits)
+        over base and overlay, sorted by code."""
+        n = len(self.index)
+        over_codes = np.fromiter(self.index.keys(), dtype=np.int64, count=n)
+        over_rows = np.fromiter(self.index.values(), dtype=np.int64, count=n) - len(self.base_codes)
+        codes = np.concatenate([self.base_codes, over_codes])
+        order = np.argsort(codes, kind="stable")
+        parts = [(self.base_q, self.q), (self.base_present, self.present)]
+        parts += [(getattr(self, "base_" + name), getattr(self, name)) for name in extra]
+        return (codes[order],) + tuple(np.concatenate([b, o[over_rows]])[order] for b, o in parts)
+
+    def _set_base(self, codes, q, present, visits=None, used=None, dirty=None, new_visits=None):
+        self.base_codes, self.base_q, self.base_present = codes, q, present
+        self.base_visits = np.zeros(len(codes), dtype=np.int64) if visits is None else visits
+        self.base_used = np.zeros(len(codes), dtype=np.int64) if used is None else used
+        self.base_dirty = np.zeros(len(codes), dtype=bool) if dirty is None else dirty
+        self.base_new_visits = np.zeros(len(codes), dtype=np.int64) if new_visits is None else new_visits
+
+    @classmethod
+    def from_dict(cls, table, actions, **options):
+        """Convert a dict Q-table (state tuple -> {action: q}) to an ArrayQTable."""
+        qt = cls(actions, capacity=max(16, len(table)), **options)
+        for state, qvals in table.items():
+            row = qt.add(state)
+            for a, v in qvals.items():
+                if a in qt.action_index:
+                    qt.set(row, a, v)
+        return qt
+
+    def delta(self, clear=True):
+        """(codes, q, present, visits) of the states changed since the last delta()
+        or save(); clear resets the change flags."""
+        nb = len(self.base_codes)
+        n = len(self.index)
+        over_codes = np.fromiter(self.index.keys(), dtype=np.int64, count=n)
+        over_rows = np.fromiter(self.index.values(), dtype=np.int64, count=n) - nb
+        changed = self.dirty[over_rows]
+        b, o = np.flatnonzero(self.base_dirty), over_rows[changed]
+        delta = (np.concatenate([self.base_codes[b], over_codes[changed]]),
+                 np.concatenate([self.base_q[b], self.q[o]]),
+                 np.concatenate([self.base_present[b], self.present[o]]),
+                 np.concatenate([self.base_visits[b], self.visits[o]]))
+        if clear:
+            self.base_dirty[b] = False
+            self.dirty[o] = False
+        return delta
+
+    def changes(self):
+        """(codes, q, present, new_visits) of the states touched since the table was
+        loaded or last saved (new, updated or just visited), without clearing any
+        flags. new_visits counts only the visits since then, so merge() can add up
+        several learners' visits to the same state."""
+        codes, q, present, dirty, new_visits = self._merged("dirty", "new_visits")
+        touched = dirty | (new_visits > 0)
+        return codes[touched], q[touched], present[touched], new_visits[touched]
+
+    def upsert(self, codes, q, present, visits=None):
+        """Overwrite (or add) whole rows, e.g. when replaying a delta log."""
+        for j, code in enumerate(np.asarray(codes).tolist()):
+            row = self._lookup(code)
+            if row < 0:
+                row = self._new_row(code, present[j])
+            qrow, prow, i = self._slot(row)
+            qrow[i] = q[j]
+            prow[i] = present[j]
+            if visits is not None:
+                if prow is self.base_present:
+                    self.base_visits[i] = visits[j]
+                else:
+                    self.visits[i] = visits[j]
+
+    def merge(self, updates):
+        """Fold changes() results (codes, q, present, new_visits) from several learners
+        into this table. A state touched by more than one learner gets the mean of
+        their values per action and the sum of their visits; untouched states keep
+        their own values. Merged states count as used now for the lru policy."""
+        updates = [u for u in updates if len(u[0])]
+        if not updates:
+            return
+        codes = np.concatenate([u[0] for u in updates])
+        q = np.concatenate([u[1] for u in updates])
+        present = np.concatenate([u[2] for u in updates])
+        uniq, inv = np.unique(codes, return_inverse=True)
+        sums = np.zeros((len(uniq), len(self.actions)))
+        counts = np.zeros((len(uniq), len(self.actions)))
+        np.add.at(sums, inv, q*present)
+        np.add.at(counts, inv, present)
+        visits = np.bincount(inv, np.concatenate([u[3] for u in updates]), len(uniq)).astype(np.int64)
+        self.clock += 1
+        rows = np.empty(len(uniq), dtype=np.int64)
+        for j, (code, s, c) in enumerate(zip(uniq.tolist(), sums, counts)):
+            row = self._lookup(code)
+            if row < 0:
+                row = self._new_row(code, self.mask(()))
+            qrow, prow, i = self._slot(row)
+            has = c > 0
+            qrow[i, has] = s[has] / c[has]
+            prow[i] |= has
+            rows[j] = row
+        self._mark(rows)
+        nb = len(self.base_codes)
+        base = rows < nb
+        for prefix, sel, r in (("base_", base, rows[base]), ("", ~base, rows[~base] - nb)):
+            getattr(self, prefix + "visits")[r] += visits[sel]
+            getattr(self, prefix + "new_visits")[r] += visits[sel]
+            getattr(self, prefix + "used")[r] = self.clock
+
+    # ---------------- Persistence ----------------
+    @staticmethod
+    def _paths(prefix):
+        return {k: f"{prefix}.{k}.npy" for k in ("codes", "q", "present", "visits")}
+
+    @classmethod
+    def _snapshot(cls, prefix):
+        """(actions, snapshot number, part paths) of the saved snapshot, or None."""
+        if os.path.exists(prefix + ".json"):
+            with open(prefix + ".json") as f:
+                manifest = json.load(f)
+            n = manifest["snapshot"]
+            return manifest["actions"], n, cls._paths(f"{prefix}.{n}")
+        # unnumbered layout written before the delta log existed
+        paths = cls._paths(prefix)
+        if os.path.exists(prefix + ".actions.json") and all(os.path.exists(paths[k]) for k in ("codes", "q", "present")):
+            with open(prefix + ".actions.json") as f:
+                return json.load(f), 0, paths
+        return None
+
+    def save(self, prefix):
+        """Write the whole table as a new snapshot (trimmed to its cap first, so save
+        time stays flat), drop the delta log it supersedes, and make the merged
+        arrays the new in-memory base."""
+        self.trim()
+        codes, q, present, visits, used = self._merged("visits", "used")
+        self._set_base(codes, q, present, visits, used)
+        self._reset_overlay()
+        write_snapshot(prefix, self.actions, codes, q, present, visits)
+
+    @classmethod
+    def exists(cls, prefix):
+        return cls._snapshot(prefix) is not None
+
+    @classmethod
+    def load(cls, prefix, actions=None, mmap=True, **options):
+        """Load the saved snapshot and replay the delta log on top. With mmap the
+        snapshot is mapped copy-on-write, so start-up is O(1) in table size and
+        updates never touch the files until the next save.
+        options (max_states, policy, trim_to) are passed to the constructor."""
+        saved = cls._snapshot(prefix)
+        if saved is None:
+            raise FileNotFoundError(f"no saved Q-table at {prefix}")
+        saved_actions, _, paths = saved
+        if actions is not None and list(actions) != saved_actions:
+            raise ValueError(f"saved table has actions {saved_actions}, expected {list(actions)}")
+        qt = cls(saved_actions, **options)
+        mode = "c" if mmap else None
+        visits = np.load(paths["visits"], mmap_mode=mode) if os.path.exists(paths["visits"]) else None
+        qt._set_base(np.load(paths["codes"], mmap_mode=mode), np.load(paths["q"], mmap_mode=mode),
+                     np.load(paths["present"], mmap_mode=mode), visits)
+        for record in read_log(prefix + ".log")[0]:
+            qt.upsert(*record)
+        # replayed rows are already on disk
+        qt.dirty[:] = False
+        return qt
+
+
+def write_snapshot(prefix, actions, codes, q, present, visits):
+    """Write and fsync the arrays as snapshot n+1, swap the manifest to it, then
+    remove the delta log and older snapshots. Until the manifest is replaced, loads
+    keep seeing the previous snapshot and log."""
+    saved = ArrayQTable._snapshot(prefix)
+    n = saved[1] + 1 if saved else 1
+    os.makedirs(os.path.dirname(prefix) or ".", exist_ok=True)
+    paths = ArrayQTable._paths(f"{prefix}.{n}")
+    for path, arr in zip(paths.values(), (codes, q, present, visits)):
+        with open(path, "wb") as f:
+            np.save(f, arr)
+            f.flush()
+            os.fsync(f.fileno())
+    with open(prefix + ".json.tmp", "w") as f:
+        json.dump({"actions": list(actions), "snapshot": n}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    # the snapshot files must be durable before the manifest points at them
+    fsync_dir(prefix)
+    os.replace(prefix + ".json.tmp", prefix + ".json")
+    fsync_dir(prefix)
+    stale = [prefix + ".log", prefix + ".actions.json"] + list(ArrayQTable._paths(prefix).values())
+    stale += [p for p in glob.glob(glob.escape(prefix) + ".*.*.npy") if not p.startswith(f"{prefix}.{n}.")]
+    for path in stale:
+        try:
+            os.remove(path)
+        except OSError:
+            # missing, or still mapped by a live table (Windows); the next snapshot retries
+            pass
+
+
+def append_log(path, delta):
+    """Append one (codes, q, present, visits) record to a delta log."""
+    with open(path, "ab") as f:
+        for arr in delta:
+            np.save(f, arr)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def read_log(path):
+    """Records of a delta log and the byte length of its intact part; a record
+    torn by a crash mid-append (and anything after it) is ignored."""
+    records = []
+    end = 0
+    if not os.path.exists(path):
+        return records, end
+    with open(path, "rb") as f:
+        while True:
+            try:
+                record = tuple(np.load(f) for _ in range(4))
+            except (ValueError, EOFError, OSError):
+                break
+            if not len({len(a) for a in record}) == 1:
+                break
+            records.append(record)
+            end = f.tell()
+    return records, end
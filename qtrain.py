@@ -0,0 +1,166 @@
+import os
+import pickle
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from arena import Arena, make_fighters
+from fighter import FighterBank, TransitionBatch
+from qtable import ArrayQTable
+from seeding import stream
+
+# Headless Q-learning for the GUI fighters. Workers play whole maze fights with the
+# GUI rules (arena.py) as fast as they can; every few tasks their changes are merged
+# into the shared tables under QTABLE_DIR, which the GUI loads on start.
+
+QTABLE_FILE = "ai_qtables.pkl"     # legacy dict tables, converted on first load
+QTABLE_DIR = "ai_qtables"          # memory-mapped ArrayQTable files, one prefix per fighter
+QTABLE_MAX_STATES = 250_000        # per fighter; colder states are evicted beyond this
+
+
+class QTrainSettings:
+    episodes = 20000
+    workers = 1
+    episodes_per_task = 1000
+    tasks_per_merge = 4     # tasks that start from the same tables (fixed, so results don't depend on workers)
+    max_steps = 400         # updates before an unfinished fight is abandoned
+    envs = 128              # arenas per task run in lockstep, their Q-updates applied as one batch
+    seed = None
+
+
+def table_prefix(name):
+    return os.path.join(QTABLE_DIR, name)
+
+
+def load_tables(fighters):
+    """ArrayQTable per fighter name, capped at QTABLE_MAX_STATES: the saved files if
+    present, else converted from the legacy pickle (or empty). A table saved with
+    different actions starts fresh."""
+    legacy = None
+    tables = {}
+    for f in fighters:
+        prefix = table_prefix(f.name)
+        if ArrayQTable.exists(prefix):
+            try:
+                tables[f.name] = ArrayQTable.load(prefix, f.all_actions(), max_states=QTABLE_MAX_STATES)
+            except ValueError:
+                # abilities changed since the table was saved; start fresh
+                tables[f.name] = ArrayQTable(f.all_actions(), max_states=QTABLE_MAX_STATES)
+            continue
+        if legacy is None:
+            legacy = {}
+            if os.path.exists(QTABLE_FILE):
+                with open(QTABLE_FILE,"rb") as fh:
+                    legacy = pickle.load(fh)
+        tables[f.name] = ArrayQTable.from_dict(legacy.get(f.name, {}), f.all_actions(), max_states=QTABLE_MAX_STATES)
+    return tables
+
+
+def save_tables(tables):
+    for name, table in tables.items():
+        table.save(table_prefix(name))
+
+
+def play_lockstep(arenas, episodes, max_steps, batch):
+    """Run arenas side by side until `episodes` fights have finished. Each round ticks
+    the fighters' banks once, steps every running arena, then flushes the batch of
+    Q-updates. Returns the number of wins per fighter name."""
+    banks = {id(f.bank): f.bank for a in arenas for f in (a.ai1, a.ai2)}.values()
+    wins = {a.ai1.name: 0 for a in arenas}
+    wins.update({a.ai2.name: 0 for a in arenas})
+    running = arenas[:episodes]
+    for a in running:
+        a.start_new_fight()
+    steps = [0]*len(running)
+    started = len(running)
+    while running:
+        for bank in banks:
+            bank.tick_statuses()
+            bank.tick_cooldowns()
+        for a in running:
+            a.step(batch, tick=False)
+        batch.flush()
+        still = []
+        for a, n in zip(running, steps):
+            winner = a.winner()
+            if winner is None and n+1 < max_steps:
+                still.append((a, n+1))
+                continue
+            if winner is not None:
+                wins[winner.name] += 1
+            if started < episodes:
+                started += 1
+                a.start_new_fight()
+                still.append((a, 0))
+        running = [a for a, _ in still]
+        steps = [n for _, n in still]
+    return wins
+
+
+def _qtrain_task(task):
+    # runs in a worker: play episodes from the saved tables, return what changed
+    episodes, max_steps, epsilons, seed, key = task
+    rng = stream(seed, *key)
+    envs = max(1, min(QTrainSettings.envs, episodes))
+    banks = (FighterBank(envs), FighterBank(envs))
+    arenas = []
+    tables = None
+    for _ in range(envs):
+        fighters = make_fighters(rng, banks)
+        if tables is None:
+            tables = load_tables(fighters)
+        for f in fighters:
+            f.q_table = tables[f.name]
+            f.epsilon = epsilons[f.name]
+        # one maze (and one set of path fields) per task
+        arenas.append(Arena(*fighters, rng=fighters[0].rng, maze_from=arenas[0] if arenas else None))
+    wins = play_lockstep(arenas, episodes, max_steps, TransitionBatch(rng))
+    changes = {name: table.changes() for name, table in tables.items()}
+    final = {name: float(np.mean(bank.epsilon_view[:bank.size])) for name, bank in zip(tables, banks)}
+    return changes, wins, final
+
+
+def train_qtables(episodes=QTrainSettings.episodes, workers=None, status_cb=None, seed=None):
+    """Train the fighters' Q-tables headlessly and merge the results into QTABLE_DIR."""
+    workers = workers or QTrainSettings.workers
+    seed = QTrainSettings.seed if seed is None else seed
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    fighters = make_fighters()
+    tables = load_tables(fighters)
+    # workers map the saved files, so make sure they exist (and hold any converted pickle)
+    save_tables(tables)
+    epsilons = {f.name: f.epsilon for f in fighters}
+
+    per_task = QTrainSettings.episodes_per_task
+    n_tasks = -(-episodes // per_task)
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    start = time.perf_counter()
+    played = 0
+    totals = {f.name: 0 for f in fighters}
+    try:
+        for first in range(0, n_tasks, QTrainSettings.tasks_per_merge):
+            tasks = []
+            for t in range(first, min(n_tasks, first + QTrainSettings.tasks_per_merge)):
+                count = min(per_task, episodes - t*per_task)
+                tasks.append((count, QTrainSettings.max_steps, epsilons, seed, (t,)))
+            results = list(executor.map(_qtrain_task, tasks)) if executor else [_qtrain_task(t) for t in tasks]
+            for name, table in tables.items():
+                table.merge([r[0][name] for r in results])
+                epsilons[name] = float(np.mean([r[2][name] for r in results]))
+                totals[name] += sum(r[1][name] for r in results)
+            save_tables(tables)
+            played += sum(t[0] for t in tasks)
+            rate = played / (time.perf_counter() - start) * 3600
+            _report(f"Episodes {played}/{episodes}  wins {totals}  states "
+                    f"{ {n: len(t) for n, t in tables.items()} }  ({rate:,.0f} episodes/hour)", status_cb)
+    finally:
+        if executor:
+            executor.shutdown()
+    return tables
+
+
+def _report(msg, status_cb):
+    if status_cb:
+        status_cb(msg)
+    else:
+        print(msg)
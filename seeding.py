@@ -0,0 +1,51 @@
+import numpy as np
+
+# Every random stream in the project is a numpy Generator derived from one master
+# seed: stream(seed, generation, task) gives the same draws on any machine or worker.
+
+def stream(seed=None, *key):
+    """Generator for the stream identified by (seed, *key). seed=None draws fresh entropy."""
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=tuple(key)))
+
+
+class BufferedRandom:
+    """random-module-like facade (random/randint/choice/uniform) over a numpy Generator.
+    Uniforms are drawn in blocks, so the scalar fight code pays one array slot per draw
+    instead of a Python-level RNG call."""
+    def __init__(self, rng=None, block=1024):
+        self.generator = rng if isinstance(rng, np.random.Generator) else np.random.default_rng(rng)
+        self.block = block
+        self._buf = self.generator.random(block).tolist()
+        self._pos = 0
+
+    def random(self):
+        if self._pos == self.block:
+            self._buf = self.generator.random(self.block).tolist()
+            self._pos = 0
+        u = self._buf[self._pos]
+        self._pos += 1
+        return u
+
+    def randint(self, a, b):
+        """Integer in [a, b], inclusive like random.randint."""
+        return a + int(self.random() * (b - a + 1))
+
+    def uniform(self, a, b):
+        return a + (b - a) * self.random()
+
+    def choice(self, seq):
+        return seq[int(self.random() * len(seq))]
+
+
+_default = None
+
+def default_random():
+    """Shared unseeded BufferedRandom for callers that don't pass their own stream."""
+    global _default
+    if _default is None:
+        _default = BufferedRandom()
+    return _default
+
+
+def default_rng():
+    return default_random().generator
@@ -0,0 +1,95 @@
+import threading
+import time
+from collections import deque, namedtuple
+
+# Runs an Arena on its own thread at a chosen speed and publishes immutable
+# snapshots of what to draw. The GUI takes only the latest snapshot each frame,
+# so drawing never holds back the simulation (and vice versa).
+
+STEP_SECONDS = 0.3          # one arena step per 0.3 s at 1x
+NEW_FIGHT_PAUSE = 1.2       # seconds between fights at 1x
+SPEEDS = (1, 4, 16, None)   # multiples of real time; None = as fast as possible
+
+FighterView = namedtuple("FighterView", "name pos hp max_hp statuses")
+Snapshot = namedtuple("Snapshot", "step fighters wins logs actions winner maze_version")
+
+
+def fighter_view(f):
+    return FighterView(f.name, f.pos, f.hp, f.max_hp, tuple(s for s in f.statuses if f.statuses[s]>0))
+
+
+class SimulationWorker(threading.Thread):
+    """Steps arena until stop(). take() returns the newest Snapshot (or None if
+    nothing new), carrying every log line since the previous take() up to
+    max_log_lines; older lines are dropped and counted. on_fight_end runs on this
+    thread after each fight and may return extra log lines."""
+    def __init__(self, arena, on_fight_end=None, speed=1, max_log_lines=200):
+        super().__init__(daemon=True)
+        self.arena = arena
+        self.on_fight_end = on_fight_end
+        self.speed = speed
+        self.wins = {arena.ai1.name: 0, arena.ai2.name: 0}
+        self.steps = 0
+        self._latest = None
+        self._logs = deque(maxlen=max_log_lines)
+        self._dropped = 0
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def set_speed(self, speed):
+        self.speed = speed
+
+    def stop(self):
+        self._stopping.set()
+        self.join()
+
+    def take(self):
+        with self._lock:
+            snap, self._latest = self._latest, None
+            if snap is None:
+                return None
+            logs = list(self._logs)
+            if self._dropped:
+                logs.insert(0, f"... {self._dropped} log lines skipped ...")
+            self._logs.clear()
+            self._dropped = 0
+        return snap._replace(logs=tuple(logs))
+
+    def _publish(self, logs, actions=(), winner=None):
+        a = self.arena
+        snap = Snapshot(self.steps, (fighter_view(a.ai1), fighter_view(a.ai2)), tuple(self.wins.values()),
+                        (), tuple((f.name, action) for f, action in actions),
+                        winner.name if winner else None, a.maze_version)
+        with self._lock:
+            self._dropped += max(0, len(self._logs) + len(logs) - self._logs.maxlen)
+            self._logs.extend(logs)
+            self._latest = snap
+
+    def _wait(self, seconds, elapsed=0.0):
+        # sleep what's left of seconds at the current speed; True once stop() was called
+        if self.speed is None:
+            return self._stopping.is_set()
+        return self._stopping.wait(max(0.0, seconds/self.speed - elapsed))
+
+    def run(self):
+        self.arena.start_new_fight()
+        self._publish(["\n===== NEW FIGHT =====\n"])
+        while not self._stopping.is_set():
+            started = time.perf_counter()
+            logs, actions = self.arena.step()
+            self.steps += 1
+            winner = self.arena.winner()
+            if winner is None:
+                self._publish(logs, actions)
+                if self._wait(STEP_SECONDS, time.perf_counter() - started):
+                    return
+                continue
+            self.wins[winner.name] += 1
+            logs.append(f"\n🏆 Winner: {winner.name}\n")
+            if self.on_fight_end:
+                logs.extend(self.on_fight_end() or [])
+            self._publish(logs, actions, winner)
+            if self._wait(NEW_FIGHT_PAUSE):
+                return
+            self.arena.start_new_fight()
+            self._publish(["\n===== NEW FIGHT =====\n"])
@@ -0,0 +1,43 @@
+import numpy as np
+from battle import A_WINS, B_WINS
+
+# Tournament evaluation: every fight counts for both participants, and ratings are
+# fitted from the whole generation's results at once. Results are kept sparse as
+# (idx_a, idx_b, points_a) arrays so large populations never need an n x n matrix.
+
+ELO_BASE = 1500.0
+ELO_SCALE = 400.0
+
+
+def round_robin_pairs(n, rng=None):
+    """Every unordered pair once; who moves first is randomised when rng is given."""
+    i, j = np.triu_indices(n, k=1)
+    if rng is not None:
+        swap = rng.random(len(i)) < 0.5
+        i, j = np.where(swap, j, i), np.where(swap, i, j)
+    return i, j
+
+
+def random_pairs(n, rounds, rng):
+    """rounds random perfect matchings, so each agent plays about `rounds` fights."""
+    m = n // 2 * 2
+    perms = np.stack([rng.permutation(n)[:m] for _ in range(rounds)])
+    return perms[:, 0::2].ravel(), perms[:, 1::2].ravel()
+
+
+def fight_points(winner):
+    # points for side A: win 1, draw 0.5, loss 0 (side B gets the rest)
+    return np.where(winner==A_WINS, 1.0, np.where(winner==B_WINS, 0.0, 0.5))
+
+
+def elo_ratings(n, idx_a, idx_b, points_a, iterations=50, prior=1.0):
+    """Fit Elo-scale ratings to all results at once (Bradley-Terry, MM iterations).
+    prior adds a virtual draw against a 1500-rated anchor so unbeaten or winless
+    agents still get finite ratings. Order of fights doesn't matter, unlike online Elo."""
+    score = np.bincount(idx_a, points_a, n) + np.bincount(idx_b, 1.0 - points_a, n) + 0.5*prior
+    strength = np.ones(n)
+    for _ in range(iterations):
+        inv = 1.0 / (strength[idx_a] + strength[idx_b])
+        denom = np.bincount(idx_a, inv, n) + np.bincount(idx_b, inv, n) + prior / (strength + 1.0)
+        strength = score / denom
+    return ELO_BASE + ELO_SCALE * np.log10(strength)